@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Benchmark de throughput do OCR (extract_pdf_ocr.py)
+Gera PDFs sintéticos em italiano localmente e mede páginas/s, pico de memória
+e uso de disco em uma matriz de DPI, psm, oem e workers
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import threading
+import subprocess
+import shutil
+import tempfile
+from pathlib import Path
+
+OCR_SCRIPT = Path(__file__).resolve().parent / 'extract_pdf_ocr.py'
+
+# Vocabulário das frases sintéticas (conteúdo típico de um livro de gramática)
+ITALIAN_WORDS = (
+    "il la lo gli le un una di da in con su per tra fra che non è sono "
+    "ho hai ha abbiamo avete hanno essere avere fare andare venire dire "
+    "sapere potere volere dovere parlare mangiare dormire capire finire "
+    "casa scuola libro lezione esercizio parola frase verbo nome aggettivo "
+    "articolo preposizione pronome passato prossimo imperfetto futuro "
+    "congiuntivo condizionale presente plurale singolare maschile femminile "
+    "oggi domani ieri sempre spesso mai ancora già molto poco bene male "
+    "città università amico amica famiglia lavoro tempo giorno settimana "
+    "perché però quando dove come quale quanto anche più meno così "
+    "caffè tè papà gioventù virtù qualità libertà età felicità"
+).split()
+
+# Densidades: (linhas por página, palavras por linha, tamanho da fonte)
+DENSITIES = {
+    'sparse': (18, 7, 13),
+    'normal': (32, 10, 11),
+    'dense': (52, 13, 9)
+}
+
+def synthetic_lines(rng, count, words_per_line):
+    """Gera linhas de texto pseudoaleatório em italiano, com numeração de exercícios"""
+    lines = []
+    for i in range(count):
+        words = [rng.choice(ITALIAN_WORDS) for _ in range(rng.randint(words_per_line - 3, words_per_line + 3))]
+        sentence = ' '.join(words).capitalize() + rng.choice('.?!')
+        if i % 6 == 0:
+            sentence = f"{i // 6 + 1}. {sentence}"
+        lines.append(sentence)
+    return lines
+
+def pdf_string(text):
+    """Codifica uma linha como string literal de PDF (WinAnsi, com escapes)"""
+    raw = text.encode('cp1252', errors='replace')
+    return b'(' + raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+def write_pdf(path, pages):
+    """
+    Grava um PDF mínimo (A4, Helvetica) com uma lista de linhas por página
+    
+    `pages` é uma lista de (linhas, tamanho da fonte). Não depende de nenhuma
+    biblioteca: os objetos e a tabela xref são montados à mão.
+    """
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # /Pages, preenchido depois de conhecer os filhos
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>'
+    ]
+    kids = []
+    for lines, font_size in pages:
+        leading = round(font_size * 1.35, 1)
+        content = [f"BT /F1 {font_size} Tf {leading} TL 60 790 Td".encode()]
+        for line in lines:
+            content.append(pdf_string(line) + b' Tj T*')
+        content.append(b'ET')
+        stream = b'\n'.join(content)
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (len(objects))
+        )
+        kids.append(len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % k for k in kids), len(kids)
+    )
+    
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        out += b'%010d 00000 n \n' % offset
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    Path(path).write_bytes(bytes(out))
+
+def generate_fixture(fixtures_dir, page_count, density, seed=0):
+    """Gera (ou reaproveita) o PDF sintético de um tamanho e densidade"""
+    path = Path(fixtures_dir) / f"synthetic-{density}-{page_count}p.pdf"
+    if path.exists():
+        return path
+    rng = random.Random(f"{seed}-{density}-{page_count}")
+    line_count, words_per_line, font_size = DENSITIES[density]
+    pages = [(synthetic_lines(rng, line_count, words_per_line), font_size) for _ in range(page_count)]
+    write_pdf(path, pages)
+    return path
+
+def directory_size(path):
+    """Soma o tamanho dos arquivos de um diretório (0 se não existir)"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def run_case(pdf_path, work_dir, dpi, psm, oem, workers, extra_args=()):
+    """
+    Executa o extract_pdf_ocr.py uma vez e mede o resultado
+    
+    O pico de memória vem do rusage do processo filho (os.wait4); o uso de
+    disco é amostrado a cada 50 ms no diretório de trabalho (imagens
+    temporárias, checkpoint e saída).
+    """
+    run_dir = Path(tempfile.mkdtemp(prefix='run-', dir=work_dir))
+    local_pdf = run_dir / pdf_path.name
+    os.symlink(pdf_path.resolve(), local_pdf)
+    output_path = run_dir / 'out.txt'
+    metrics_path = run_dir / 'metrics.json'
+    cmd = [
+        sys.executable, str(OCR_SCRIPT), str(local_pdf), str(output_path), 'ita',
+        '--jobs', str(workers), '--dpi', str(dpi), '--psm', str(psm), '--oem', str(oem),
+        '--no-cache', '--metrics', str(metrics_path), *extra_args
+    ]
+    
+    peak_disk = 0
+    finished = threading.Event()
+    
+    def sample_disk():
+        nonlocal peak_disk
+        while not finished.wait(0.05):
+            peak_disk = max(peak_disk, directory_size(run_dir))
+    
+    sampler = threading.Thread(target=sample_disk, daemon=True)
+    # O log vai para fora do run_dir para não contar no uso de disco
+    log_path = Path(work_dir) / f"{run_dir.name}.log"
+    with open(log_path, 'wb') as log:
+        started = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+        sampler.start()
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - started
+    finished.set()
+    sampler.join()
+    log_tail = log_path.read_bytes()[-500:].decode('utf-8', errors='replace')
+    log_path.unlink()
+    peak_disk = max(peak_disk, directory_size(run_dir))
+    
+    result = {
+        'pdf': pdf_path.name,
+        'dpi': dpi,
+        'psm': psm,
+        'oem': oem,
+        'workers': workers,
+        'extra_args': list(extra_args),
+        'ok': os.waitstatus_to_exitcode(status) == 0,
+        'wall_seconds': round(elapsed, 3),
+        # ru_maxrss é em KB no Linux
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 1),
+        'peak_disk_mb': round(peak_disk / (1024 * 1024), 2),
+        'output_bytes': output_path.stat().st_size if output_path.exists() else 0
+    }
+    if metrics_path.exists():
+        metrics = json.loads(metrics_path.read_text(encoding='utf-8'))
+        result['pages'] = metrics['pages_ocr']
+        result['chars'] = metrics['chars']
+        result['pages_per_second'] = metrics['pages_per_second']
+        result['phases'] = metrics['phases']
+    else:
+        result['error'] = log_tail.strip()
+    
+    shutil.rmtree(run_dir, ignore_errors=True)
+    return result
+
+def error_summary(result):
+    """Linha de erro mais relevante da saída de uma execução que falhou"""
+    lines = [line for line in result.get('error', '').splitlines() if line.strip()]
+    errors = [line for line in lines if '❌' in line]
+    return (errors or lines or ['falhou'])[-1].strip()
+
+def case_key(result):
+    """Identifica uma configuração para comparar resultados de execuções diferentes"""
+    return (result['pdf'], result['dpi'], result['psm'], result['oem'], result['workers'],
+            tuple(result['extra_args']))
+
+def int_list(spec):
+    """Converte '150,300' em [150, 300]"""
+    return [int(value) for value in spec.split(',') if value.strip()]
+
+def parse_args(argv=None):
+    """Interpreta os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(
+        description='Benchmark de throughput do extract_pdf_ocr.py com PDFs sintéticos gerados localmente',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=(
+            "Exemplo:\n"
+            "  python3 benchmark_ocr.py\n"
+            "  python3 benchmark_ocr.py --pages 5,20 --dpi 150,300 --workers 1,4 -o antes.json\n"
+            "  python3 benchmark_ocr.py --extra-args='--stream --io pipe' --compare antes.json\n"
+            "\nRequer apenas pdftoppm/pdfinfo (poppler-utils) e tesseract com o idioma 'ita'."
+        )
+    )
+    parser.add_argument('--pages', type=int_list, default=[5, 20],
+                        help='quantidade de páginas dos PDFs gerados (padrão: 5,20)')
+    parser.add_argument('--densities', default='sparse,dense',
+                        help=f"densidades de texto: {', '.join(DENSITIES)} (padrão: sparse,dense)")
+    parser.add_argument('--dpi', type=int_list, default=[150, 300],
+                        help='resoluções testadas (padrão: 150,300)')
+    parser.add_argument('--psm', type=int_list, default=[3],
+                        help='page segmentation modes testados (padrão: 3)')
+    parser.add_argument('--oem', type=int_list, default=[3],
+                        help='OCR engine modes testados (padrão: 3)')
+    parser.add_argument('--workers', type=int_list, default=None,
+                        help=f'quantidades de workers testadas (padrão: 1,{os.cpu_count()})')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='execuções por configuração; vale a de maior páginas/s (padrão: 1)')
+    parser.add_argument('--extra-args', default='',
+                        help="opções adicionais para o extract_pdf_ocr.py (ex.: '--stream --io pipe')")
+    parser.add_argument('--work-dir', default=None,
+                        help='diretório para os PDFs gerados e as execuções (padrão: temporário)')
+    parser.add_argument('-o', '--output', default='ocr_benchmark.json',
+                        help='arquivo JSON com os resultados (padrão: ocr_benchmark.json)')
+    parser.add_argument('--compare', default=None,
+                        help='JSON de um benchmark anterior para comparar páginas/s')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    
+    missing = [tool for tool in ('pdftoppm', 'pdfinfo', 'tesseract') if not shutil.which(tool)]
+    if missing:
+        print(f"❌ Ferramentas não encontradas: {', '.join(missing)}")
+        sys.exit(1)
+    
+    densities = [d.strip() for d in args.densities.split(',') if d.strip()]
+    unknown = [d for d in densities if d not in DENSITIES]
+    if unknown:
+        print(f"❌ Densidade desconhecida: {', '.join(unknown)} (use {', '.join(DENSITIES)})")
+        sys.exit(1)
+    
+    workers = args.workers or sorted({1, os.cpu_count() or 1})
+    extra_args = args.extra_args.split()
+    
+    print("\n" + "="*80)
+    print("⏱️  BENCHMARK DE OCR (extract_pdf_ocr.py)")
+    print("="*80 + "\n")
+    
+    work_dir = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix='ocr-bench-'))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    fixtures_dir = work_dir / 'fixtures'
+    fixtures_dir.mkdir(exist_ok=True)
+    
+    fixtures = [
+        generate_fixture(fixtures_dir, page_count, density)
+        for density in densities
+        for page_count in args.pages
+    ]
+    print(f"📄 {len(fixtures)} PDFs sintéticos em {fixtures_dir}")
+    
+    matrix = list(itertools.product(fixtures, args.dpi, args.psm, args.oem, workers))
+    print(f"🧮 {len(matrix)} configurações × {args.repeat} execuções\n")
+    
+    results = []
+    try:
+        for n, (pdf_path, dpi, psm, oem, jobs) in enumerate(matrix, 1):
+            runs = [run_case(pdf_path, work_dir, dpi, psm, oem, jobs, extra_args) for _ in range(args.repeat)]
+            best = max(runs, key=lambda r: r.get('pages_per_second') or 0)
+            best['runs'] = len(runs)
+            results.append(best)
+            
+            if best['ok']:
+                print(f"  [{n}/{len(matrix)}] {pdf_path.name} dpi={dpi} psm={psm} oem={oem} workers={jobs}: "
+                      f"✅ {best['pages_per_second']:.2f} páginas/s, {best['peak_rss_mb']} MB RSS, "
+                      f"{best['peak_disk_mb']} MB em disco")
+            else:
+                print(f"  [{n}/{len(matrix)}] {pdf_path.name} dpi={dpi} psm={psm} oem={oem} workers={jobs}: "
+                      f"❌ {error_summary(best)}")
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'cpu_count': os.cpu_count(),
+        'extra_args': extra_args,
+        'results': results
+    }
+    Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"\n💾 Resultados salvos em: {args.output}")
+    
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        # A comparação ignora as opções extras, para medir justamente o efeito delas
+        baseline = {case_key(r)[:5]: r for r in previous['results'] if r.get('pages_per_second')}
+        print(f"\n📊 Comparação com {args.compare} (páginas/s):")
+        for result in results:
+            before = baseline.get(case_key(result)[:5])
+            if before and result.get('pages_per_second'):
+                ratio = result['pages_per_second'] / before['pages_per_second']
+                print(f"   • {result['pdf']} dpi={result['dpi']} psm={result['psm']} oem={result['oem']} "
+                      f"workers={result['workers']}: {before['pages_per_second']:.2f} → "
+                      f"{result['pages_per_second']:.2f} ({ratio:.2f}×)")
+    
+    if not all(r['ok'] for r in results):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
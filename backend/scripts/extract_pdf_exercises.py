@@ -8,6 +8,8 @@ import json
 import re
 import os
 
+from page_index import PageIndex
+
 # Mapeamento de exercícios por página e módulo correspondente
 EXERCISE_MAPPING = {
     "pag. 37": {
@@ -69,13 +71,12 @@ EXERCISE_MAPPING = {
 }
 
 def read_text_file(filepath):
-    """Lê o arquivo de texto extraído do PDF"""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return f.readlines()
+    """Indexa o arquivo de texto extraído do PDF (linhas lidas sob demanda, índice em <arquivo>.pageidx)"""
+    return PageIndex(filepath)
 
-def extract_exercise_from_line_range(lines, start_line, end_line):
+def extract_exercise_from_line_range(index, start_line, end_line):
     """Extrai o conteúdo de um exercício dado um range de linhas"""
-    return ''.join(lines[start_line-1:end_line-1])
+    return index.lines(start_line, end_line)
 
 def parse_prepositions_simple(answers_text):
     """
@@ -172,9 +173,9 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
     
     print("🔍 Lendo arquivo de texto extraído do PDF...")
-    lines = read_text_file(txt_file)
-    total_lines = len(lines)
-    print(f"✅ {total_lines} linhas lidas")
+    index = read_text_file(txt_file)
+    total_lines = index.line_count
+    print(f"✅ {total_lines} linhas indexadas" + (" (índice reaproveitado)" if not index.rebuilt else ""))
     
     print("\n📋 Mapeamento de exercícios encontrados:")
     print("=" * 70)
@@ -182,7 +183,8 @@ def main():
     extracted_exercises = {}
     
     # Extrair seção completa de soluções (páginas 72-75)
-    solutions_section = ''.join(lines[3850:4200])
+    solutions_section = index.lines(3851, 4201)
+    index.close()
     
     # 1. Verbos no presente (pag. 37)
     print("\n1️⃣  Verbos no Presente (pag. 37) - Módulo 3")
@@ -5,11 +5,1707 @@ Ideal para arquivos PDF que são imagens digitalizadas
 """
 
 import os
+import re
 import sys
+import glob
+import json
+import mmap
+import time
+import queue
+import shutil
+import signal
+import ctypes
+import ctypes.util
+import difflib
+import hashlib
+import functools
+import argparse
+import threading
 import subprocess
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-def extract_text_from_pdf(pdf_path, output_path=None, language='ita'):
+def cgroup_cpu_limit():
+    """Cota de CPU do cgroup (v2: cpu.max; v1: cfs_quota_us) em CPUs, ou None sem limite"""
+    try:
+        quota, period = Path('/sys/fs/cgroup/cpu.max').read_text().split()[:2]
+        return None if quota == 'max' else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_quota_us').read_text())
+        period = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_period_us').read_text())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 and period > 0 else None
+
+def available_cpus():
+    """CPUs que o processo pode usar de fato: afinidade limitada pela cota do cgroup"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        # Arredonda para baixo: um worker a mais que a cota só gera throttling
+        cpus = min(cpus, int(limit))
+    return max(1, cpus)
+
+def default_jobs():
+    """Número padrão de workers de OCR: um por CPU disponível para o processo"""
+    return available_cpus()
+
+def plan_cpu(jobs=None, threads=None):
+    """
+    Divide as CPUs disponíveis entre workers (páginas em paralelo) e threads
+    internas de cada tesseract
+    
+    Cada tesseract usa OpenMP e, sem limite, abre uma thread por núcleo; com
+    vários workers isso disputa as mesmas CPUs. Como o paralelismo por página
+    escala melhor que o interno, o padrão é um worker por CPU com uma thread
+    cada; fixando só `jobs`, as CPUs que sobram viram threads por worker, e
+    fixando só `threads`, os workers ocupam o restante.
+    
+    Returns:
+        (workers, threads por worker)
+    """
+    cpus = available_cpus()
+    if jobs and threads:
+        return jobs, threads
+    if threads:
+        return max(1, cpus // threads), threads
+    workers = jobs or cpus
+    return workers, max(1, cpus // workers)
+
+def apply_cpu_plan(jobs=None, threads=None):
+    """Calcula o plano de CPU, limita as threads do tesseract (OMP_THREAD_LIMIT) e o registra no log"""
+    if threads is None and os.environ.get('OMP_THREAD_LIMIT', '').isdigit():
+        threads = int(os.environ['OMP_THREAD_LIMIT'])
+    workers, threads = plan_cpu(jobs, threads)
+    # Herdado por cada processo tesseract; a libtesseract residente lê ao ser carregada
+    os.environ['OMP_THREAD_LIMIT'] = str(threads)
+    
+    cpus = available_cpus()
+    limit = cgroup_cpu_limit()
+    quota = f", cota do cgroup {limit:g}" if limit is not None else ""
+    print(f"🧵 Plano de CPU: {cpus} CPUs disponíveis{quota} → "
+          f"{workers} workers × {threads} thread(s) do tesseract")
+    if workers * threads > cpus:
+        print(f"⚠️  {workers * threads} threads para {cpus} CPUs: os workers vão disputar os núcleos")
+    return workers, threads
+
+def get_page_count(pdf_path):
+    """Obtém o número de páginas do PDF via pdfinfo"""
+    result = subprocess.run(['pdfinfo', str(pdf_path)], check=True, capture_output=True, text=True)
+    match = re.search(r'^Pages:\s+(\d+)', result.stdout, re.MULTILINE)
+    if not match:
+        raise ValueError(f"Não foi possível determinar o número de páginas de {pdf_path}")
+    return int(match.group(1))
+
+# Opções do pdftoppm para cada modo de renderização: cor (24 bits), tons de
+# cinza (8 bits) ou bilevel (1 bit). Os scans são texto preto em papel, e o
+# tesseract binariza a imagem de qualquer forma.
+RENDER_MODES = {
+    'color': [],
+    'gray': ['-gray'],
+    'mono': ['-mono']
+}
+
+RENDER_MODE_NAMES = {
+    'color': 'cor (24 bits)',
+    'gray': 'tons de cinza (8 bits)',
+    'mono': 'bilevel (1 bit)'
+}
+
+def render_page(pdf_path, page_num, output_prefix, dpi=300, mode='color', timeout=None):
+    """Renderiza uma única página do PDF como PNG e retorna o caminho da imagem"""
+    cmd_convert = [
+        'pdftoppm',
+        '-png',
+        *RENDER_MODES[mode],
+        '-r', str(dpi),
+        '-f', str(page_num),
+        '-l', str(page_num),
+        '-singlefile',
+        str(pdf_path),
+        str(output_prefix)
+    ]
+    subprocess.run(cmd_convert, check=True, capture_output=True, timeout=timeout)
+    return Path(f"{output_prefix}.png")
+
+def render_page_bytes(pdf_path, page_num, dpi=300, mode='color', timeout=None):
+    """
+    Renderiza uma única página e retorna a imagem em memória
+    
+    Sem raiz de saída o pdftoppm escreve no stdout; o formato é PPM (PGM em
+    tons de cinza, PBM em bilevel), sem compressão, evitando a codificação e a
+    decodificação de PNG.
+    """
+    cmd_convert = [
+        'pdftoppm',
+        *RENDER_MODES[mode],
+        '-r', str(dpi),
+        '-f', str(page_num),
+        '-l', str(page_num),
+        '-singlefile',
+        str(pdf_path)
+    ]
+    return subprocess.run(cmd_convert, check=True, capture_output=True, timeout=timeout).stdout
+
+class FileRenderer:
+    """Renderiza páginas como PNG no diretório temporário; cada imagem é apagada após o uso"""
+    
+    def __init__(self, pdf_path, temp_dir, mode='color', timeout=None):
+        self.pdf_path = pdf_path
+        self.temp_dir = temp_dir
+        self.mode = mode
+        self.timeout = timeout
+    
+    def render(self, page_num, dpi):
+        output_prefix = self.temp_dir / f'page-{page_num}'
+        return render_page(self.pdf_path, page_num, output_prefix, dpi, self.mode, self.timeout)
+    
+    def discard(self, image):
+        image.unlink(missing_ok=True)
+
+class PipeRenderer:
+    """Renderiza páginas em memória (pdftoppm → stdout → tesseract stdin), sem arquivos"""
+    
+    def __init__(self, pdf_path, mode='color', timeout=None):
+        self.pdf_path = pdf_path
+        self.mode = mode
+        self.timeout = timeout
+    
+    def render(self, page_num, dpi):
+        return render_page_bytes(self.pdf_path, page_num, dpi, self.mode, self.timeout)
+    
+    def discard(self, image):
+        pass
+
+def shard_ranges(page_numbers, shards):
+    """
+    Divide as páginas em até `shards` intervalos contínuos (primeira, última) de tamanho parecido
+    
+    Lacunas na sequência (páginas já concluídas) também quebram um intervalo,
+    pois cada intervalo vira uma única chamada do pdftoppm com -f/-l.
+    """
+    page_numbers = sorted(page_numbers)
+    if not page_numbers:
+        return []
+    size = -(-len(page_numbers) // max(1, shards))
+    
+    ranges = []
+    first = previous = page_numbers[0]
+    count = 1
+    for page_num in page_numbers[1:]:
+        if page_num != previous + 1 or count == size:
+            ranges.append((first, previous))
+            first, count = page_num, 0
+        previous = page_num
+        count += 1
+    ranges.append((first, previous))
+    return ranges
+
+def image_info(image):
+    """
+    Retorna (bytes, largura, altura) de uma imagem de página (PNG em disco ou PPM em memória)
+    
+    Só o cabeçalho é lido; largura e altura ficam None se o formato não for reconhecido.
+    """
+    if isinstance(image, bytes):
+        size, header = len(image), image[:64]
+    else:
+        size = image.stat().st_size
+        with open(image, 'rb') as f:
+            header = f.read(64)
+    
+    if header.startswith(b'\x89PNG') and len(header) >= 24:
+        return size, int.from_bytes(header[16:20], 'big'), int.from_bytes(header[20:24], 'big')
+    match = re.match(rb'P[1-6]\s+(?:#[^\n]*\s+)*(\d+)\s+(\d+)', header)
+    if match:
+        return size, int(match.group(1)), int(match.group(2))
+    return size, None, None
+
+# Triagem antes do OCR: miniatura (lado maior, em pixels), contraste mínimo de um
+# pixel de tinta em relação ao fundo e grade do hash perceptual (GRADE × GRADE bits)
+SCREEN_THUMBNAIL = 200
+INK_CONTRAST = 48
+HASH_GRID = 32
+
+PageFingerprint = namedtuple('PageFingerprint', 'page ink hash')
+
+def read_pgm(stream):
+    """
+    Lê a próxima imagem PGM binária (P5, 8 bits) de um stream
+    
+    Retorna (largura, altura, pixels) ou None no fim do stream.
+    """
+    tokens = []
+    token = b''
+    while len(tokens) < 4:
+        char = stream.read(1)
+        if not char:
+            if tokens or token:
+                raise ValueError('imagem PGM truncada')
+            return None
+        if char == b'#' and not token:
+            stream.readline()
+        elif char.isspace():
+            if token:
+                tokens.append(token)
+                token = b''
+        else:
+            token += char
+    
+    magic, width, height, maxval = tokens[0], int(tokens[1]), int(tokens[2]), int(tokens[3])
+    if magic != b'P5' or maxval > 255:
+        raise ValueError(f"formato de miniatura não suportado: {magic.decode(errors='replace')}")
+    pixels = stream.read(width * height)
+    if len(pixels) < width * height:
+        raise ValueError('imagem PGM truncada')
+    return width, height, pixels
+
+def ink_coverage(pixels):
+    """
+    Fração dos pixels pelo menos INK_CONTRAST níveis mais escuros que o fundo
+    
+    O fundo é o nível do papel: o percentil 90 de claridade, para que páginas
+    densas (mais tinta que papel) não sejam tomadas como fundo escuro.
+    """
+    histogram = Counter(pixels)
+    seen = 0
+    for background in sorted(histogram, reverse=True):
+        seen += histogram[background]
+        if seen >= 0.1 * len(pixels):
+            break
+    ink = sum(count for value, count in histogram.items() if value < background - INK_CONTRAST)
+    return ink / len(pixels)
+
+def thumbnail_hash(pixels, width, height, grid=HASH_GRID):
+    """
+    Hash perceptual (dHash) de uma miniatura em tons de cinza, com grid × grid bits
+    
+    A imagem é reduzida a grid linhas × (grid + 1) colunas de médias por bloco;
+    cada bit diz se um bloco é mais claro que o vizinho à direita. A mesma
+    página (ou a mesma folha escaneada de novo) difere em poucos bits.
+    """
+    columns = [x * width // (grid + 1) for x in range(grid + 2)]
+    widths = [max(1, right - left) for left, right in zip(columns, columns[1:])]
+    bits = 0
+    for row in range(grid):
+        top = row * height // grid
+        bottom = max(top + 1, (row + 1) * height // grid)
+        sums = [0] * (grid + 1)
+        for y in range(top, bottom):
+            offset = y * width
+            for cell in range(grid + 1):
+                sums[cell] += sum(pixels[offset + columns[cell]:offset + columns[cell + 1]])
+        means = [total / size for total, size in zip(sums, widths)]
+        for cell in range(grid):
+            bits = (bits << 1) | (means[cell] > means[cell + 1])
+    return bits
+
+def hash_distance(a, b):
+    """Número de bits diferentes entre dois hashes perceptuais"""
+    return bin(a ^ b).count('1')
+
+def page_fingerprints(pdf_path, page_numbers, size=SCREEN_THUMBNAIL, timeout=None):
+    """
+    Gera um PageFingerprint (página, cobertura de tinta, hash) por página
+    
+    Cada intervalo contínuo de páginas é uma única chamada do pdftoppm, que
+    escreve miniaturas PGM (-gray -scale-to) em sequência no stdout; nenhuma
+    imagem vai para o disco. `timeout` limita os segundos por página.
+    """
+    for first, last in shard_ranges(page_numbers, 1):
+        cmd = [
+            'pdftoppm',
+            '-gray',
+            '-scale-to', str(size),
+            '-f', str(first),
+            '-l', str(last),
+            str(pdf_path)
+        ]
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as proc:
+            timer = None
+            if timeout:
+                timer = threading.Timer(timeout * (last - first + 1), proc.kill)
+                timer.start()
+            try:
+                for page_num in range(first, last + 1):
+                    image = read_pgm(proc.stdout)
+                    if image is None:
+                        break
+                    width, height, pixels = image
+                    yield PageFingerprint(page_num, ink_coverage(pixels), thumbnail_hash(pixels, width, height))
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                proc.stdout.close()
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+def screen_pages(pdf_path, page_numbers, blank_ink=0.002, max_distance=16, timeout=None,
+                 dpi=300, mode='color'):
+    """
+    Triagem antes do OCR: páginas em branco e duplicatas (hash perceptual confirmado pela imagem completa)
+    
+    Returns:
+        ({página: cobertura de tinta} das em branco, {página: original} das duplicadas)
+    """
+    blank = {}
+    duplicates = {}
+    originals = []
+    digests = {}
+    
+    def digest(page_num):
+        # Cada página candidata ou original é renderizada no máximo uma vez
+        if page_num not in digests:
+            image = render_page_bytes(pdf_path, page_num, dpi, mode, timeout)
+            digests[page_num] = hashlib.sha256(image).digest()
+        return digests[page_num]
+    
+    for fingerprint in page_fingerprints(pdf_path, page_numbers, timeout=timeout):
+        if fingerprint.ink < blank_ink:
+            blank[fingerprint.page] = fingerprint.ink
+            continue
+        for original in originals:
+            similar_ink = abs(original.ink - fingerprint.ink) <= 0.25 * max(original.ink, fingerprint.ink)
+            if (similar_ink and hash_distance(original.hash, fingerprint.hash) <= max_distance
+                    and digest(original.page) == digest(fingerprint.page)):
+                duplicates[fingerprint.page] = original.page
+                break
+        else:
+            originals.append(fingerprint)
+    return blank, duplicates
+
+def extract_text_layer(pdf_path):
+    """
+    Extrai a camada de texto embutida de todas as páginas com pdftotext
+    
+    Uma única chamada cobre o documento inteiro; o pdftotext separa as páginas
+    com form feed. Gera (página, texto) à medida que a saída chega, sem
+    carregar o texto do documento inteiro.
+    """
+    command = ['pdftotext', '-enc', 'UTF-8', str(pdf_path), '-']
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                          encoding='utf-8', errors='replace') as proc:
+        page_num = 1
+        buffer = ''
+        for chunk in iter(lambda: proc.stdout.read(65536), ''):
+            *pages, buffer = (buffer + chunk).split('\f')
+            for text in pages:
+                yield page_num, text.strip()
+                page_num += 1
+        yield page_num, buffer.strip()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, command)
+
+# Pontuação comum em textos didáticos; qualquer outro símbolo conta como lixo
+READABLE_PUNCTUATION = set('.,;:!?¿¡\'"«»“”‘’()[]{}-–—/…%°ºª*+=&@#§_<>|')
+
+def text_layer_is_usable(text, min_chars=50):
+    """
+    Decide se o texto embutido de uma página dispensa o OCR
+    
+    Rejeita páginas curtas demais (provavelmente só imagem), com caracteres de
+    substituição ou símbolos estranhos (fonte com codificação quebrada) e com
+    poucas palavras alfabéticas.
+    """
+    if len(text) < min_chars or '\ufffd' in text:
+        return False
+    
+    visible = [c for c in text if not c.isspace()]
+    readable = sum(1 for c in visible if c.isalnum() or c in READABLE_PUNCTUATION)
+    if readable < 0.9 * len(visible):
+        return False
+    
+    words = re.findall(r'\w+', text)
+    alpha_words = [w for w in words if w.isalpha()]
+    return len(alpha_words) >= 0.5 * len(words)
+
+def run_tesseract(image, language, psm=3, oem=3, configs=(), dpi=None, timeout=None):
+    """
+    Executa o tesseract em uma imagem de página e retorna o processo concluído
+    
+    `image` é o caminho da imagem ou os bytes dela (enviados pelo stdin).
+    `configs` são arquivos de configuração do tesseract (ex.: 'tsv') que mudam
+    o formato da saída. `dpi` informa a resolução da imagem, necessária quando
+    ela chega sem metadados (PPM pelo stdin). Passados `timeout` segundos o
+    processo é morto e subprocess.TimeoutExpired é levantada.
+    """
+    image_bytes = image if isinstance(image, bytes) else None
+    cmd_ocr = [
+        'tesseract',
+        'stdin' if image_bytes is not None else str(image),
+        'stdout',
+        '-l', language,
+        '--psm', str(psm),  # Page segmentation mode (3 = Fully automatic)
+        '--oem', str(oem),  # OCR Engine mode (3 = Default, best available)
+        *(['--dpi', str(dpi)] if dpi else []),
+        *configs
+    ]
+    
+    result = subprocess.run(cmd_ocr, input=image_bytes, capture_output=True, timeout=timeout)
+    result.stdout = result.stdout.decode('utf-8', errors='replace')
+    return result
+
+def parse_tsv_layout(tsv):
+    """
+    Interpreta a saída TSV do tesseract de uma página
+    
+    Retorna (texto, confiança média das palavras, linhas). A confiança é None
+    quando nenhuma palavra foi reconhecida. Cada linha é um dicionário com
+    'text', 'confidence', 'bbox' ([left, top, width, height] em pixels) e
+    'words' (cada palavra com 'text', 'confidence' e 'bbox'). No texto, linhas
+    viram quebras de linha e cada novo parágrafo é separado por uma linha em
+    branco, como na saída de texto do tesseract.
+    """
+    lines = {}
+    confidences = []
+    
+    for row in tsv.splitlines()[1:]:
+        cols = row.split('\t')
+        # Nível 4 = linha, 5 = palavra; conf -1 indica elementos de layout sem texto
+        if len(cols) < 12 or cols[0] not in ('4', '5'):
+            continue
+        key = (int(cols[2]), int(cols[3]), int(cols[4]))
+        bbox = [int(c) for c in cols[6:10]]
+        line = lines.setdefault(key, {'bbox': bbox, 'words': []})
+        
+        if cols[0] == '4':
+            line['bbox'] = bbox
+            continue
+        
+        word = cols[11].strip()
+        conf = float(cols[10])
+        if not word or conf < 0:
+            continue
+        line['words'].append({'text': word, 'confidence': conf, 'bbox': bbox})
+        confidences.append(conf)
+    
+    text_lines = []
+    layout = []
+    previous_par = None
+    for (block, par, _), line in lines.items():
+        if not line['words']:
+            continue
+        if previous_par is not None and (block, par) != previous_par:
+            text_lines.append('')
+        previous_par = (block, par)
+        
+        line_text = ' '.join(word['text'] for word in line['words'])
+        line_conf = sum(word['confidence'] for word in line['words']) / len(line['words'])
+        text_lines.append(line_text)
+        layout.append({
+            'text': line_text,
+            'confidence': round(line_conf, 2),
+            'bbox': line['bbox'],
+            'words': line['words']
+        })
+    
+    mean_conf = sum(confidences) / len(confidences) if confidences else None
+    return '\n'.join(text_lines), mean_conf, layout
+
+def tesseract_version():
+    """Retorna a versão do tesseract instalado (primeira linha de --version)"""
+    result = subprocess.run(['tesseract', '--version'], capture_output=True, text=True)
+    output = (result.stdout or result.stderr).strip()
+    return output.splitlines()[0] if output else 'desconhecida'
+
+def default_cache_dir():
+    """Diretório padrão do cache de OCR (respeita XDG_CACHE_HOME)"""
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'imparatelingua' / 'ocr'
+
+class OcrCache:
+    """
+    Cache persistente do texto de OCR por página, endereçado pelo conteúdo
+    
+    A chave é o SHA-256 da imagem renderizada somado aos parâmetros do OCR
+    (idioma, --psm, --oem e versão do tesseract). Cada entrada fica em
+    <cache_dir>/<2 primeiros hex>/<chave>.txt. Quando o tamanho total passa de
+    `max_bytes`, as entradas usadas há mais tempo são removidas.
+    """
+    
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def key(self, image_bytes, params):
+        """Calcula a chave de uma página a partir da imagem e dos parâmetros"""
+        digest = hashlib.sha256(image_bytes)
+        digest.update('\0'.join(str(p) for p in params).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.txt"
+    
+    def get(self, key):
+        """Retorna o texto em cache ou None"""
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        
+        # Atualiza o mtime para a remoção por uso mais antigo
+        os.utime(path)
+        with self._lock:
+            self.hits += 1
+        return text
+    
+    def put(self, key, text):
+        """Grava o texto de uma página de forma atômica"""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(text, encoding='utf-8')
+        os.replace(tmp_path, path)
+    
+    def evict(self):
+        """Remove as entradas menos usadas até caber em max_bytes; retorna quantas saíram"""
+        entries = []
+        for path in self.cache_dir.glob('*/*.txt'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+class OcrError(RuntimeError):
+    """O tesseract terminou com erro em uma página"""
+
+class OcrEngine:
+    """
+    Parâmetros do tesseract (idioma, --psm, --oem) com cache opcional
+    
+    Com `timeout`, uma página que passa desse tempo em segundos é interrompida
+    e levanta subprocess.TimeoutExpired; uma execução com erro levanta OcrError.
+    """
+    
+    def __init__(self, language='ita', psm=3, oem=3, cache=None, layout=False, timeout=None):
+        self.language = language
+        self.layout = layout
+        self.psm = psm
+        self.oem = oem
+        self.cache = cache
+        self.timeout = timeout
+        self.tesseract_version = None
+        if cache is not None:
+            self.tesseract_version = self.version()
+    
+    def version(self):
+        """Versão do tesseract usada na chave do cache"""
+        return tesseract_version()
+    
+    def language_for(self, page_num):
+        """Idioma de uma página específica (None: o idioma do engine)"""
+        return None
+    
+    def _execute(self, image_file, psm, configs, dpi=None, language=None):
+        """Executa o tesseract e retorna (sucesso, saída bruta ou mensagem de erro)"""
+        result = run_tesseract(image_file, language or self.language, psm, self.oem, configs, dpi, self.timeout)
+        if result.returncode != 0:
+            message = result.stderr.decode('utf-8', errors='replace').strip().splitlines()
+            return False, f"tesseract saiu com código {result.returncode}" + (f": {message[-1]}" if message else '')
+        return True, result.stdout
+    
+    def _run(self, image_file, psm, configs=(), dpi=None, language=None):
+        """Executa o tesseract (ou consulta o cache) e retorna a saída bruta"""
+        if self.cache is None:
+            ok, output = self._execute(image_file, psm, configs, dpi, language)
+            if not ok:
+                raise OcrError(output)
+            return output
+        
+        params = (language or self.language, psm, self.oem, self.tesseract_version, *configs)
+        if dpi:
+            params += ('dpi', dpi)
+        image_bytes = image_file if isinstance(image_file, bytes) else Path(image_file).read_bytes()
+        key = self.cache.key(image_bytes, params)
+        output = self.cache.get(key)
+        if output is None:
+            ok, output = self._execute(image_file, psm, configs, dpi, language)
+            # Falhas do tesseract não vão para o cache
+            if not ok:
+                raise OcrError(output)
+            self.cache.put(key, output)
+        return output
+    
+    def ocr(self, image_file, psm=None, dpi=None, language=None):
+        """Retorna o texto de uma página, usando o cache quando disponível"""
+        return self._run(image_file, psm or self.psm, (), dpi, language).strip()
+    
+    def ocr_layout(self, image_file, psm=None, dpi=None, language=None):
+        """Retorna (texto, confiança média, linhas com caixas) em uma única execução TSV"""
+        return parse_tsv_layout(self._run(image_file, psm or self.psm, ('tsv',), dpi, language))
+    
+    def close(self):
+        """Libera recursos do engine (nada a fazer no modo por processo)"""
+        pass
+
+# Cabeçalho que o tesseract de linha de comando escreve antes das linhas TSV
+TSV_HEADER = 'level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext'
+
+class TesseractLibrary:
+    """Acesso mínimo à API C da libtesseract e da leptonica via ctypes"""
+    
+    _instance = None
+    _lock = threading.Lock()
+    
+    @classmethod
+    def load(cls):
+        """Carrega as bibliotecas uma única vez; levanta OSError se não estiverem instaladas"""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+    
+    def __init__(self):
+        tess_name = ctypes.util.find_library('tesseract')
+        lept_name = ctypes.util.find_library('leptonica') or ctypes.util.find_library('lept')
+        if not tess_name or not lept_name:
+            raise OSError("libtesseract/leptonica não encontradas (instale libtesseract-dev)")
+        
+        tess = ctypes.CDLL(tess_name)
+        lept = ctypes.CDLL(lept_name)
+        
+        tess.TessVersion.restype = ctypes.c_char_p
+        tess.TessBaseAPICreate.restype = ctypes.c_void_p
+        tess.TessBaseAPIInit2.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
+        tess.TessBaseAPIInit2.restype = ctypes.c_int
+        tess.TessBaseAPISetPageSegMode.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        tess.TessBaseAPISetImage2.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        tess.TessBaseAPISetSourceResolution.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        tess.TessMonitorCreate.restype = ctypes.c_void_p
+        tess.TessMonitorDelete.argtypes = [ctypes.c_void_p]
+        tess.TessMonitorSetDeadlineMSecs.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        tess.TessBaseAPIRecognize.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        tess.TessBaseAPIRecognize.restype = ctypes.c_int
+        tess.TessBaseAPIGetUTF8Text.argtypes = [ctypes.c_void_p]
+        tess.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p
+        tess.TessBaseAPIGetTsvText.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        tess.TessBaseAPIGetTsvText.restype = ctypes.c_void_p
+        tess.TessDeleteText.argtypes = [ctypes.c_void_p]
+        for name in ('TessBaseAPIClear', 'TessBaseAPIEnd', 'TessBaseAPIDelete'):
+            getattr(tess, name).argtypes = [ctypes.c_void_p]
+        
+        lept.pixRead.argtypes = [ctypes.c_char_p]
+        lept.pixRead.restype = ctypes.c_void_p
+        lept.pixReadMem.argtypes = [ctypes.c_char_p, ctypes.c_size_t]
+        lept.pixReadMem.restype = ctypes.c_void_p
+        lept.pixDestroy.argtypes = [ctypes.POINTER(ctypes.c_void_p)]
+        
+        self.tess = tess
+        self.lept = lept
+
+class ResidentOcrEngine(OcrEngine):
+    """
+    Engine de OCR residente: a libtesseract é carregada no próprio processo
+    
+    Cada thread do pool mantém a sua instância da TessBaseAPI, inicializada uma
+    única vez por idioma (o traineddata é carregado só nesse momento) e
+    reaproveitada para todas as páginas que a thread recebe da fila do pool.
+    Com idioma por página (--auto-language), cada thread mantém uma instância
+    por modelo usado.
+    As chamadas ao ctypes liberam o GIL, então as threads rodam em paralelo.
+    
+    O `timeout` vira um prazo do monitor do tesseract (ETEXT_DESC): o
+    reconhecimento é interrompido quando ele vence, e a instância da thread é
+    descartada e recriada na próxima página.
+    """
+    
+    def __init__(self, language='ita', psm=3, oem=3, cache=None, layout=False, timeout=None):
+        self.library = TesseractLibrary.load()
+        self._local = threading.local()
+        self._apis = []
+        self._apis_lock = threading.Lock()
+        super().__init__(language, psm, oem, cache, layout, timeout)
+    
+    def version(self):
+        # Mesmo formato da primeira linha de `tesseract --version`
+        return f"tesseract {self.library.tess.TessVersion().decode()}"
+    
+    def _api(self, language):
+        """Instância da TessBaseAPI desta thread para o idioma pedido"""
+        apis = getattr(self._local, 'apis', None)
+        if apis is None:
+            apis = self._local.apis = {}
+        
+        api = apis.get(language)
+        if api is None:
+            tess = self.library.tess
+            api = tess.TessBaseAPICreate()
+            if tess.TessBaseAPIInit2(api, None, language.encode(), self.oem) != 0:
+                tess.TessBaseAPIDelete(api)
+                raise RuntimeError(f"Falha ao inicializar o tesseract para o idioma '{language}'")
+            apis[language] = api
+            with self._apis_lock:
+                self._apis.append(api)
+        return api
+    
+    def _discard_api(self, language):
+        """Encerra a instância desta thread (após um timeout); a próxima página cria outra"""
+        api = self._local.apis.pop(language, None)
+        if api is None:
+            return
+        with self._apis_lock:
+            self._apis.remove(api)
+        self.library.tess.TessBaseAPIEnd(api)
+        self.library.tess.TessBaseAPIDelete(api)
+    
+    def _execute(self, image_file, psm, configs, dpi=None, language=None):
+        tess, lept = self.library.tess, self.library.lept
+        language = language or self.language
+        api = self._api(language)
+        
+        if isinstance(image_file, bytes):
+            pix = lept.pixReadMem(image_file, len(image_file))
+        else:
+            pix = lept.pixRead(str(image_file).encode())
+        if not pix:
+            return False, 'leptonica não conseguiu ler a imagem'
+        
+        monitor = None
+        try:
+            tess.TessBaseAPISetPageSegMode(api, psm)
+            tess.TessBaseAPISetImage2(api, pix)
+            if dpi:
+                tess.TessBaseAPISetSourceResolution(api, dpi)
+            if self.timeout:
+                # Reconhece com prazo; os Get*Text seguintes só leem o resultado
+                monitor = tess.TessMonitorCreate()
+                tess.TessMonitorSetDeadlineMSecs(monitor, int(self.timeout * 1000))
+                started = time.perf_counter()
+                status = tess.TessBaseAPIRecognize(api, monitor)
+                if time.perf_counter() - started >= self.timeout:
+                    tess.TessBaseAPIClear(api)
+                    self._discard_api(language)
+                    raise subprocess.TimeoutExpired('libtesseract', self.timeout)
+                if status != 0:
+                    return False, f"TessBaseAPIRecognize retornou {status}"
+            if 'tsv' in configs:
+                text_ptr = tess.TessBaseAPIGetTsvText(api, 0)
+            else:
+                text_ptr = tess.TessBaseAPIGetUTF8Text(api)
+            if not text_ptr:
+                return False, 'libtesseract não retornou texto'
+            try:
+                output = ctypes.string_at(text_ptr).decode('utf-8', errors='replace')
+            finally:
+                tess.TessDeleteText(text_ptr)
+        finally:
+            if monitor is not None:
+                tess.TessMonitorDelete(monitor)
+            if api in self._local.apis.values():
+                tess.TessBaseAPIClear(api)
+            lept.pixDestroy(ctypes.byref(ctypes.c_void_p(pix)))
+        
+        if 'tsv' in configs:
+            output = f"{TSV_HEADER}\n{output}"
+        return True, output
+    
+    def close(self):
+        """Encerra todas as instâncias da TessBaseAPI criadas pelas threads"""
+        tess = self.library.tess
+        with self._apis_lock:
+            for api in self._apis:
+                tess.TessBaseAPIEnd(api)
+                tess.TessBaseAPIDelete(api)
+            self._apis = []
+
+def create_engine(language='ita', psm=3, oem=3, cache=None, resident=False, layout=False, timeout=None):
+    """
+    Cria o engine de OCR; sem a libtesseract, o modo residente cai para o tesseract por processo
+    
+    Com `layout=True` o OCR usa a saída TSV, que traz também caixas e confiança
+    de cada palavra.
+    """
+    if resident:
+        try:
+            return ResidentOcrEngine(language, psm, oem, cache, layout, timeout)
+        except OSError as e:
+            print(f"⚠️  Engine residente indisponível ({e}); usando o tesseract por processo")
+    return OcrEngine(language, psm, oem, cache, layout, timeout)
+
+# Palavras funcionais frequentes e exclusivas de cada idioma (também sem acento,
+# como a passada rápida costuma devolvê-las); as comuns a mais de um idioma,
+# como 'e', 'a', 'da', 'se' e 'quando', ficam de fora
+LANGUAGE_STOPWORDS = {
+    'ita': {
+        'il', 'lo', 'la', 'gli', 'le', 'di', 'del', 'dello', 'della', 'dei', 'degli', 'delle',
+        'che', 'è', 'non', 'per', 'con', 'una', 'uno', 'un', 'sono', 'nel', 'nella', 'alla',
+        'al', 'ai', 'come', 'anche', 'questo', 'questa', 'ma', 'più', 'piu', 'ci', 'mi', 'ti',
+        'io', 'lui', 'noi', 'voi', 'loro', 'ho', 'hanno', 'essere', 'siamo',
+        'perché', 'perche', 'dove', 'molto', 'sul', 'sulla', 'tra', 'fra', 'cosa'
+    },
+    'por': {
+        'os', 'as', 'do', 'dos', 'das', 'na', 'nos', 'nas', 'de', 'que', 'não',
+        'nao', 'para', 'com', 'uma', 'um', 'ele', 'ela', 'eles', 'elas', 'você', 'voce',
+        'são', 'sao', 'está', 'mais', 'muito', 'também', 'tambem', 'pelo', 'pela', 'ao',
+        'aos', 'isso', 'este', 'esta', 'essa', 'seu', 'foi', 'ser', 'tem', 'mas', 'como',
+        'em', 'ou', 'já', 'ja'
+    },
+    'eng': {
+        'the', 'and', 'of', 'to', 'is', 'are', 'was', 'were', 'that', 'with', 'for', 'this',
+        'you', 'not', 'have', 'has', 'be', 'on', 'it', 'at', 'by', 'from', 'they', 'we',
+        'he', 'she', 'which', 'will', 'can', 'an', 'or', 'what', 'there', 'their', 'your'
+    }
+}
+# Mínimo de palavras funcionais para decidir o idioma de uma página
+MIN_LANGUAGE_EVIDENCE = 3
+# Para o OCR usar só o modelo de um idioma, ele precisa dominar a página: ao menos
+# LANGUAGE_DOMINANCE vezes as palavras funcionais do segundo idioma, que não passa
+# de MAX_MINORITY_SHARE do total. Páginas mistas (lição em italiano, explicação em
+# português) ficam com todos os candidatos
+LANGUAGE_DOMINANCE = 3
+MAX_MINORITY_SHARE = 0.15
+
+# Resultado da identificação: idioma (None = todos os candidatos) e palavras funcionais por idioma
+LanguageGuess = namedtuple('LanguageGuess', 'language scores')
+
+def language_ratio(scores):
+    """Palavras funcionais do idioma mais frequente ÷ as do segundo (None se o segundo não tem nenhuma)"""
+    ranked = sorted(scores.values(), reverse=True)
+    if len(ranked) < 2 or not ranked[1]:
+        return None
+    return round(ranked[0] / ranked[1], 2)
+
+def detect_language(text, candidates):
+    """
+    Idioma dominante de um texto entre os candidatos, pelas palavras funcionais
+    
+    Retorna um LanguageGuess; o idioma é None sem evidência suficiente (poucas
+    palavras) ou quando nenhum idioma domina (ver LANGUAGE_DOMINANCE).
+    """
+    scores = dict.fromkeys((lang for lang in candidates if lang in LANGUAGE_STOPWORDS), 0)
+    for word in re.findall(r'[^\W\d_]+', text.lower()):
+        for lang in scores:
+            if word in LANGUAGE_STOPWORDS[lang]:
+                scores[lang] += 1
+    ranked = sorted(scores.values(), reverse=True)
+    top = ranked[0] if ranked else 0
+    runner_up = ranked[1] if len(ranked) > 1 else 0
+    dominant = (top >= MIN_LANGUAGE_EVIDENCE and top >= LANGUAGE_DOMINANCE * runner_up
+                and runner_up < MAX_MINORITY_SHARE * sum(ranked))
+    return LanguageGuess(max(scores, key=scores.get) if dominant else None, scores)
+
+def detect_page_languages(pdf_path, page_numbers, engine, pool, candidates, dpi=100, psm=6, timeout=None):
+    """
+    Passada rápida de identificação do idioma de cada página
+    
+    Cada página é renderizada em baixa resolução e em tons de cinza, em
+    memória, e lida só com o modelo do primeiro candidato e um --psm barato:
+    o texto sai imperfeito, mas as palavras funcionais bastam para o
+    detect_language. Uma página sem evidência suficiente, sem um idioma
+    dominante (ou cuja passada falhou) fica com idioma None e o OCR completo
+    usa todos os candidatos.
+    
+    Returns:
+        {página: LanguageGuess}
+    """
+    def detect(page_num):
+        image = render_page_bytes(pdf_path, page_num, dpi, 'gray', timeout)
+        return detect_language(engine.ocr(image, psm, dpi, candidates[0]), candidates)
+    
+    futures = {pool.submit(detect, page_num): page_num for page_num in page_numbers}
+    languages = {}
+    for future in as_completed(futures):
+        try:
+            languages[futures[future]] = future.result()
+        except (subprocess.SubprocessError, OcrError):
+            languages[futures[future]] = LanguageGuess(None, {})
+    return languages
+
+class PageLanguageEngine:
+    """
+    Visão de um engine (de um PDF) que escolhe o modelo de cada página
+    
+    O OCR completo de uma página carrega só o modelo do idioma detectado para
+    ela; páginas fora de `languages` ({página: LanguageGuess}) ou sem idioma
+    dominante usam o idioma do engine, com todos os candidatos. O resto é delegado ao engine, que pode estar
+    sendo compartilhado com outros PDFs do lote.
+    """
+    
+    def __init__(self, engine, languages):
+        self.engine = engine
+        self.languages = languages
+    
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+    
+    def language_for(self, page_num):
+        guess = self.languages.get(page_num)
+        return guess.language if guess else None
+
+# Resultado do OCR de uma página; layout = {'confidence', 'lines', 'width', 'height'} quando o
+# engine usa TSV (largura e altura da imagem reconhecida, a unidade das caixas), metrics =
+# tempos, tamanho da imagem e worker (ver page_metrics) e error = motivo da falha de uma
+# página que esgotou as tentativas (texto vazio)
+PageResult = namedtuple('PageResult', ['page', 'text', 'seconds', 'layout', 'metrics', 'error'],
+                        defaults=[None, None, None])
+
+def page_metrics(image, render_seconds, ocr_seconds):
+    """Métricas de uma página: tempos, tamanho da imagem e worker que fez o OCR"""
+    image_bytes, width, height = image_info(image)
+    return {
+        'render_seconds': round(render_seconds, 4) if render_seconds is not None else None,
+        'ocr_seconds': round(ocr_seconds, 4),
+        'image_bytes': image_bytes,
+        'width': width,
+        'height': height,
+        'worker': threading.current_thread().name
+    }
+
+def timed_ocr(engine, page_num, image_file, dpi=None, render_seconds=None, psm=None):
+    """Executa o OCR de uma página e retorna um PageResult (com o tempo de renderização, se dado)"""
+    started = time.perf_counter()
+    language = engine.language_for(page_num)
+    layout = None
+    if engine.layout:
+        text, confidence, lines = engine.ocr_layout(image_file, psm, dpi, language)
+    else:
+        text = engine.ocr(image_file, psm, dpi, language)
+    ocr_seconds = time.perf_counter() - started
+    
+    metrics = page_metrics(image_file, render_seconds, ocr_seconds)
+    if engine.layout:
+        layout = {'confidence': confidence, 'lines': lines,
+                  'width': metrics['width'], 'height': metrics['height']}
+    return PageResult(page_num, text, ocr_seconds, layout, metrics)
+
+def ocr_with_retries(page_num, attempt, retries=0, retry_psm=None):
+    """
+    Executa `attempt(psm)` para uma página, tentando de novo após timeout ou erro
+    
+    A primeira tentativa usa psm=None (o padrão do engine); as `retries`
+    seguintes usam `retry_psm`, uma segmentação mais simples (ex.: 6, bloco
+    único) que costuma destravar páginas em que a análise de layout empaca.
+    Esgotadas as tentativas, retorna um PageResult vazio com `error`, para que
+    a execução continue nas outras páginas.
+    """
+    started = time.perf_counter()
+    errors = []
+    for attempt_num in range(retries + 1):
+        try:
+            return attempt(retry_psm if attempt_num else None)
+        except subprocess.TimeoutExpired as e:
+            errors.append(f"tempo esgotado ({e.timeout:g}s)")
+        except Exception as e:
+            errors.append(str(e) or type(e).__name__)
+    return PageResult(page_num, '', time.perf_counter() - started, error='; '.join(errors))
+
+def ocr_and_discard(renderer, engine, page_num, image_file, dpi, render_seconds, slots, retries=0, retry_psm=None):
+    """Faz OCR de uma imagem já renderizada; no fim a descarta e libera a vaga dela em `slots`"""
+    try:
+        return ocr_with_retries(
+            page_num,
+            lambda psm: timed_ocr(engine, page_num, image_file, dpi, render_seconds, psm),
+            retries, retry_psm
+        )
+    finally:
+        renderer.discard(image_file)
+        slots.release()
+
+def render_and_ocr(renderer, engine, page_num, dpi=None, retries=0, retry_psm=None):
+    """Renderiza e faz OCR de uma página, repetindo as duas etapas a cada tentativa"""
+    def attempt(psm):
+        started = time.perf_counter()
+        image_file = renderer.render(page_num, dpi)
+        try:
+            return timed_ocr(engine, page_num, image_file, dpi, time.perf_counter() - started, psm)
+        finally:
+            renderer.discard(image_file)
+    
+    return ocr_with_retries(page_num, attempt, retries, retry_psm)
+
+def ocr_pages_sharded(pdf_path, temp_dir, page_numbers, engine, pool, shards, window, dpi=300, mode='color',
+                      timeout=None, retries=0, retry_psm=None):
+    """
+    Renderiza intervalos de páginas em paralelo e gera um PageResult por página, na ordem em que terminam
+    
+    Com `window` imagens à espera do OCR, o pdftoppm do intervalo é pausado até uma ser apagada.
+    """
+    completed = queue.Queue()
+    slots = threading.BoundedSemaphore(window)
+    single_pages = FileRenderer(pdf_path, temp_dir, mode, timeout)
+    
+    def render_shard(index, first_page, last_page):
+        cmd_convert = [
+            'pdftoppm',
+            '-png',
+            *RENDER_MODES[mode],
+            '-r', str(dpi),  # DPI (maior = melhor qualidade)
+            '-f', str(first_page),
+            '-l', str(last_page),
+            '-progress',
+            str(pdf_path),
+            str(temp_dir / f'page-s{index}')
+        ]
+        rendered = set()
+        try:
+            # -progress escreve "página última_página arquivo" a cada imagem gravada
+            proc = subprocess.Popen(cmd_convert, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                    text=True, errors='replace')
+            messages = []
+            paused = threading.Event()
+            started = time.perf_counter()
+            
+            def watchdog():
+                # Mata o pdftoppm travado em uma página; o intervalo termina como falha
+                while proc.poll() is None:
+                    if not paused.is_set() and time.perf_counter() - started > timeout:
+                        proc.kill()
+                        messages.append(f"sem progresso por {timeout:g}s")
+                        return
+                    time.sleep(0.5)
+            
+            if timeout:
+                threading.Thread(target=watchdog, daemon=True).start()
+            
+            for line in proc.stderr:
+                fields = line.split(maxsplit=2)
+                if len(fields) != 3 or not fields[0].isdigit() or not fields[1].isdigit():
+                    messages.append(line.strip())
+                    continue
+                render_seconds = time.perf_counter() - started
+                page_num = int(fields[0])
+                rendered.add(page_num)
+                if not slots.acquire(blocking=False):
+                    # Janela cheia: o pdftoppm fica parado até o OCR apagar uma imagem
+                    paused.set()
+                    proc.send_signal(signal.SIGSTOP)
+                    slots.acquire()
+                    proc.send_signal(signal.SIGCONT)
+                started = time.perf_counter()
+                paused.clear()
+                future = pool.submit(ocr_and_discard, single_pages, engine, page_num, Path(fields[2].strip()),
+                                     None, render_seconds, slots, retries, retry_psm)
+                future.add_done_callback(completed.put)
+            
+            if proc.wait():
+                print(f"⚠️  pdftoppm falhou nas páginas {first_page}-{last_page} "
+                      f"(código {proc.returncode}{': ' + messages[-1] if messages else ''}); "
+                      f"renderizando as restantes uma a uma")
+            
+            for page_num in range(first_page, last_page + 1):
+                if page_num not in rendered:
+                    future = pool.submit(render_and_ocr, single_pages, engine, page_num, dpi, retries, retry_psm)
+                    future.add_done_callback(completed.put)
+        except Exception as e:
+            completed.put(e)
+    
+    for index, (first_page, last_page) in enumerate(shard_ranges(page_numbers, shards)):
+        threading.Thread(target=render_shard, args=(index, first_page, last_page), daemon=True).start()
+    
+    for _ in page_numbers:
+        item = completed.get()
+        if isinstance(item, Exception):
+            raise item
+        yield item.result()
+
+def ocr_pages_streaming(renderer, page_numbers, engine, pool, window, dpi=300, retries=0, retry_psm=None):
+    """
+    Renderiza e executa OCR página a página, sem rasterizar o PDF inteiro antes
+    
+    Uma thread renderiza as páginas em sequência e entrega cada imagem ao pool
+    de OCR assim que ela existe; a imagem é descartada logo após o OCR. No
+    máximo `window` imagens existem ao mesmo tempo (em disco ou em memória,
+    conforme o `renderer`). Uma página cuja renderização falha é repetida
+    (renderização e OCR) dentro do pool, com as `retries` do OCR.
+    
+    Gera um PageResult por página, na ordem em que terminam.
+    """
+    slots = threading.BoundedSemaphore(window)
+    completed = queue.Queue()
+    
+    def retry_page(page_num):
+        try:
+            return render_and_ocr(renderer, engine, page_num, dpi, retries, retry_psm)
+        finally:
+            slots.release()
+    
+    def render_all():
+        for page_num in page_numbers:
+            slots.acquire()
+            try:
+                started = time.perf_counter()
+                try:
+                    image_file = renderer.render(page_num, dpi)
+                except Exception:
+                    future = pool.submit(retry_page, page_num)
+                else:
+                    render_seconds = time.perf_counter() - started
+                    future = pool.submit(ocr_and_discard, renderer, engine, page_num, image_file, dpi,
+                                         render_seconds, slots, retries, retry_psm)
+            except Exception as e:
+                slots.release()
+                completed.put(e)
+                return
+            future.add_done_callback(completed.put)
+    
+    render_thread = threading.Thread(target=render_all, daemon=True)
+    render_thread.start()
+    
+    for _ in page_numbers:
+        item = completed.get()
+        if isinstance(item, Exception):
+            raise item
+        yield item.result()
+
+class AdaptiveOcr:
+    """
+    OCR em dois níveis de qualidade guiado pela confiança do tesseract
+    
+    Cada página passa primeiro por um nível rápido (DPI menor e --psm mais
+    barato, com saída TSV para ler a confiança de cada palavra). Só as páginas
+    cuja confiança média fica abaixo de `min_confidence` (ou sem nenhuma
+    palavra reconhecida) são renderizadas de novo no DPI completo com os
+    parâmetros normais do engine. Uma página que falha é repetida até
+    `retries` vezes, com `retry_psm` no nível completo.
+    """
+    
+    FAST = 'rápido'
+    FULL = 'completo'
+    
+    def __init__(self, engine, renderer, dpi=300, fast_dpi=150, fast_psm=6, min_confidence=80,
+                 retries=0, retry_psm=None):
+        self.engine = engine
+        self.renderer = renderer
+        self.dpi = dpi
+        self.fast_dpi = fast_dpi
+        self.fast_psm = fast_psm
+        self.min_confidence = min_confidence
+        self.retries = retries
+        self.retry_psm = retry_psm
+        self.page_tiers = {}
+    
+    def ocr_page(self, page_num, psm=None):
+        """Processa uma página, subindo de nível se necessário; retorna um PageResult"""
+        started = time.perf_counter()
+        
+        image = self.renderer.render(page_num, self.fast_dpi)
+        rendered = time.perf_counter()
+        try:
+            text, confidence, lines = self.engine.ocr_layout(image, self.fast_psm, self.fast_dpi,
+                                                             self.engine.language_for(page_num))
+            metrics = page_metrics(image, rendered - started, time.perf_counter() - rendered)
+        finally:
+            self.renderer.discard(image)
+        layout = {'confidence': confidence, 'lines': lines,
+                  'width': metrics['width'], 'height': metrics['height']}
+        
+        tier = self.FAST
+        if confidence is None or confidence < self.min_confidence:
+            tier = self.FULL
+            render_started = time.perf_counter()
+            image = self.renderer.render(page_num, self.dpi)
+            try:
+                result = timed_ocr(self.engine, page_num, image, self.dpi,
+                                   time.perf_counter() - render_started, psm)
+            finally:
+                self.renderer.discard(image)
+            text, layout = result.text, result.layout
+            # Tempos somam os dois níveis; a imagem descrita é a do nível completo
+            for key in ('render_seconds', 'ocr_seconds'):
+                result.metrics[key] = round(result.metrics[key] + metrics[key], 4)
+            metrics = result.metrics
+        
+        metrics['tier'] = tier
+        self.page_tiers[page_num] = (tier, confidence)
+        if not self.engine.layout:
+            layout = None
+        return PageResult(page_num, text, time.perf_counter() - started, layout, metrics)
+    
+    def pages(self, page_numbers, pool, window):
+        """Gera um PageResult por página, na ordem em que terminam, com até `window` páginas em andamento"""
+        slots = threading.BoundedSemaphore(window)
+        completed = queue.Queue()
+        
+        def submit_all():
+            for page_num in page_numbers:
+                slots.acquire()
+                try:
+                    future = pool.submit(ocr_with_retries, page_num, functools.partial(self.ocr_page, page_num),
+                                         self.retries, self.retry_psm)
+                except Exception as e:
+                    slots.release()
+                    completed.put(e)
+                    return
+                future.add_done_callback(completed.put)
+        
+        threading.Thread(target=submit_all, daemon=True).start()
+        
+        for _ in page_numbers:
+            item = completed.get()
+            if isinstance(item, Exception):
+                raise item
+            # A vaga só é liberada depois que o resultado sai daqui
+            slots.release()
+            yield item.result()
+    
+    def print_report(self):
+        """Mostra quantas páginas ficaram em cada nível"""
+        fast = sorted(p for p, (tier, _) in self.page_tiers.items() if tier == self.FAST)
+        full = sorted(p for p, (tier, _) in self.page_tiers.items() if tier == self.FULL)
+        print(f"\n🎚️  Níveis de qualidade (confiança mínima {self.min_confidence}):")
+        print(f"   • {self.FAST} ({self.fast_dpi} DPI, psm {self.fast_psm}): {len(fast)} páginas")
+        print(f"   • {self.FULL} ({self.dpi} DPI, psm {self.engine.psm}): {len(full)} páginas")
+        if full:
+            print(f"   • Páginas no nível {self.FULL}: {', '.join(map(str, full))}")
+
+class OcrMetrics:
+    """
+    Tempos por página e por fase de uma execução (gravados com --metrics)
+    
+    As fases são tempos de relógio ('text_layer', 'ocr', 'write'); a
+    renderização acontece junto com o OCR, dentro da fase 'ocr'. 'workers'
+    soma o tempo de renderização e de OCR de todas as páginas, que passa do
+    tempo de relógio quando há vários workers.
+    """
+    
+    def __init__(self, pdf_path, jobs):
+        self.pdf_path = pdf_path
+        self.jobs = jobs
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.pages = {}
+        self.blank_pages = []
+        self.duplicate_pages = {}
+        self.languages = {}
+        self.language_scores = {}
+    
+    def phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+    
+    def add_page(self, result):
+        entry = {'page': result.page, 'chars': len(result.text)}
+        entry.update(result.metrics or {})
+        if result.error:
+            entry['error'] = result.error
+        self.pages[result.page] = entry
+    
+    def screened(self, blank, duplicates):
+        """Registra as páginas que a triagem tirou do OCR"""
+        self.blank_pages = sorted(blank)
+        self.duplicate_pages = {page: duplicates[page] for page in sorted(duplicates)}
+    
+    def summary(self):
+        """Dicionário com totais, fases e páginas (ordenadas), pronto para JSON"""
+        wall = time.perf_counter() - self.started
+        pages = [self.pages[p] for p in sorted(self.pages)]
+        return {
+            'pdf': str(self.pdf_path),
+            'jobs': self.jobs,
+            'tesseract_threads': os.environ.get('OMP_THREAD_LIMIT'),
+            'wall_seconds': round(wall, 3),
+            'pages_ocr': len(pages),
+            'pages_per_second': round(len(pages) / wall, 3) if wall > 0 else None,
+            'chars': sum(p['chars'] for p in pages),
+            'failed_pages': [p['page'] for p in pages if 'error' in p],
+            'blank_pages': self.blank_pages,
+            'duplicate_pages': self.duplicate_pages,
+            'languages': {page: self.languages[page] for page in sorted(self.languages)},
+            'language_scores': {page: self.language_scores[page] for page in sorted(self.language_scores)},
+            'language_ratios': {page: language_ratio(self.language_scores[page])
+                                for page in sorted(self.language_scores)},
+            'phases': {name: round(seconds, 3) for name, seconds in self.phases.items()},
+            'workers': {
+                'render_seconds': round(sum(p.get('render_seconds') or 0 for p in pages), 3),
+                'ocr_seconds': round(sum(p.get('ocr_seconds') or 0 for p in pages), 3)
+            },
+            'pages': pages
+        }
+    
+    def write(self, metrics_path):
+        """Grava o resumo em JSON e o retorna"""
+        summary = self.summary()
+        Path(metrics_path).write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding='utf-8')
+        return summary
+
+def text_hash(text):
+    """SHA-256 do texto de uma página (usado no manifesto de checkpoint)"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class OcrCheckpoint:
+    """
+    Manifesto de progresso por página para retomar execuções interrompidas
+    
+    Fica em <saida>.ocr-checkpoint/: o texto de cada página concluída é salvo em
+    page-N.txt e manifest.jsonl recebe uma linha por página (página, status,
+    hash do texto, caracteres, segundos, origem do texto e, quando houver, a
+    página original de uma duplicata, o idioma do OCR e as palavras funcionais
+    de cada candidato que o decidiram). Com --jsonl, as linhas
+    e caixas da página vão para page-N.layout.json. A primeira linha identifica
+    o PDF de origem; um checkpoint de outro PDF (ou de outra versão dele) é
+    descartado.
+    
+    Os textos ficam só em disco: é daqui que a saída final é montada, página a
+    página, sem manter o livro inteiro em memória.
+    """
+    
+    def __init__(self, output_path, pdf_path):
+        self.checkpoint_dir = Path(f"{output_path}.ocr-checkpoint")
+        self.manifest_path = self.checkpoint_dir / 'manifest.jsonl'
+        stat = pdf_path.stat()
+        self.source = {
+            'pdf': str(pdf_path.resolve()),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime
+        }
+        self.duplicates = {}
+        self.languages = {}
+        self.language_scores = {}
+        self._lock = threading.Lock()
+    
+    def _page_path(self, page_num):
+        return self.checkpoint_dir / f"page-{page_num}.txt"
+    
+    def _layout_path(self, page_num):
+        return self.checkpoint_dir / f"page-{page_num}.layout.json"
+    
+    def load(self):
+        """Retorna {página: origem do texto} das páginas já concluídas e íntegras"""
+        try:
+            lines = self.manifest_path.read_text(encoding='utf-8').splitlines()
+        except FileNotFoundError:
+            return {}
+        
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except json.JSONDecodeError:
+            return {}
+        if header.get('source') != self.source:
+            return {}
+        
+        pages = {}
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Última linha incompleta: o processo morreu durante a escrita
+                break
+            if entry.get('status') not in ('ok', 'empty'):
+                continue
+            try:
+                text = self._page_path(entry['page']).read_text(encoding='utf-8')
+            except FileNotFoundError:
+                continue
+            if text_hash(text) == entry.get('sha256'):
+                pages[entry['page']] = entry.get('source', 'ocr')
+                if 'duplicate_of' in entry:
+                    self.duplicates[entry['page']] = entry['duplicate_of']
+                if 'language' in entry:
+                    self.languages[entry['page']] = entry['language']
+                if 'language_scores' in entry:
+                    self.language_scores[entry['page']] = entry['language_scores']
+        return pages
+    
+    def read_text(self, page_num):
+        """Texto registrado de uma página"""
+        return self._page_path(page_num).read_text(encoding='utf-8')
+    
+    def read_layout(self, page_num):
+        """Layout registrado de uma página (None se não houver)"""
+        try:
+            return json.loads(self._layout_path(page_num).read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def open(self, resume):
+        """Prepara o checkpoint; com resume=True retorna {página: origem} das já concluídas"""
+        pages = self.load() if resume else {}
+        if not pages:
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+            self.checkpoint_dir.mkdir(parents=True)
+            with open(self.manifest_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'source': self.source}) + '\n')
+        return pages
+    
+    def _write(self, path, content):
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(content, encoding='utf-8')
+        os.replace(tmp_path, path)
+    
+    def record(self, page_num, text, seconds, source='ocr', layout=None, duplicate_of=None, language=None,
+               language_scores=None):
+        """Registra uma página concluída (texto e layout primeiro, depois a linha do manifesto)"""
+        self._write(self._page_path(page_num), text)
+        if layout is not None:
+            self._write(self._layout_path(page_num), json.dumps(layout, ensure_ascii=False))
+        
+        entry = {
+            'page': page_num,
+            'status': 'failed' if source == 'failed' else ('ok' if text else 'empty'),
+            'sha256': text_hash(text),
+            'chars': len(text),
+            'seconds': round(seconds, 3),
+            'source': source
+        }
+        if duplicate_of is not None:
+            entry['duplicate_of'] = duplicate_of
+            self.duplicates[page_num] = duplicate_of
+        if language is not None:
+            entry['language'] = language
+            self.languages[page_num] = language
+        if language_scores is not None:
+            entry['language_scores'] = language_scores
+            self.language_scores[page_num] = language_scores
+        with self._lock, open(self.manifest_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def remove(self):
+        """Apaga o checkpoint após uma execução concluída"""
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+
+def cleanup_temp_dir(temp_dir):
+    """Remove imagens que sobraram no diretório temporário e o próprio diretório"""
+    if not temp_dir.exists():
+        return
+    for img in temp_dir.glob('page-*.png'):
+        img.unlink(missing_ok=True)
+    # temp_ocr/<pdf>/ e, se não houver outro PDF em andamento, o temp_ocr/
+    for directory in (temp_dir, temp_dir.parent):
+        try:
+            directory.rmdir()
+        except OSError:
+            break
+
+def format_page(page_num, page_text):
+    """Monta o bloco de uma página com o cabeçalho 'PÁGINA N'"""
+    return [
+        f"\n{'='*80}\n",
+        f"PÁGINA {page_num}\n",
+        f"{'='*80}\n\n",
+        page_text
+    ]
+
+def parse_page_ranges(spec):
+    """Converte '86-174' ou '1,3,10-12' no conjunto de páginas correspondente"""
+    pages = set()
+    for part in spec.split(','):
+        part = part.strip()
+        match = re.fullmatch(r'(\d+)(?:\s*-\s*(\d+))?', part)
+        if not match:
+            raise argparse.ArgumentTypeError(f"intervalo de páginas inválido: '{part}'")
+        start = int(match.group(1))
+        end = int(match.group(2) or start)
+        if start < 1 or end < start:
+            raise argparse.ArgumentTypeError(f"intervalo de páginas inválido: '{part}'")
+        pages.update(range(start, end + 1))
+    return pages
+
+def format_page_ranges(pages):
+    """Inverso de parse_page_ranges: {1, 2, 3, 7} → '1-3, 7'"""
+    ranges = shard_ranges(pages, 1)
+    return ', '.join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+# Cabeçalho que format_page gera antes do texto de cada página, já unido por '\n'
+PAGE_BANNER_RE = re.compile('\n?\n={80}\n\nPÁGINA (\\d+)\n\n={80}\n\n\n'.encode('utf-8'))
+
+def page_record(page_num, page_text, source='ocr', layout=None, duplicate_of=None, language=None,
+                language_scores=None):
+    """
+    Monta o registro JSONL de uma página
+    
+    `source` é 'ocr', 'text-layer', 'blank' (página em branco, sem OCR) ou
+    'duplicate' (texto reaproveitado da página `duplicate_of`); `layout`
+    ({'confidence', 'lines', 'width', 'height'}) vem do OCR em TSV. As caixas
+    estão em pixels da imagem reconhecida, de `width` × `height`: no modo
+    adaptativo a resolução muda de uma página para outra, e bbox / width dá a
+    posição relativa. Páginas sem layout (camada de texto, ou mantidas de uma
+    saída antiga) ficam com confiança, largura e altura None e sem linhas.
+    `language` é o idioma usado no OCR da página com --auto-language e
+    `language_scores` as palavras funcionais de cada candidato que o decidiram
+    (com a razão entre os dois primeiros em 'language_ratio').
+    """
+    confidence = layout['confidence'] if layout else None
+    record = {
+        'page': page_num,
+        'source': source,
+        'text': page_text,
+        'confidence': round(confidence, 2) if confidence is not None else None,
+        'width': layout.get('width') if layout else None,
+        'height': layout.get('height') if layout else None,
+        'lines': layout['lines'] if layout else []
+    }
+    if duplicate_of is not None:
+        record['duplicate_of'] = duplicate_of
+    if language is not None:
+        record['language'] = language
+    if language_scores is not None:
+        record['language_scores'] = language_scores
+        record['language_ratio'] = language_ratio(language_scores)
+    return record
+
+class ExistingOutput:
+    """
+    Páginas de uma saída já gerada (.txt e, opcionalmente, .jsonl), lidas sob demanda
+    
+    O .txt é mapeado em memória e indexado pelos cabeçalhos 'PÁGINA N'; do
+    .jsonl guarda-se apenas a posição de cada registro. Assim o --pages mantém
+    as páginas não tocadas sem carregar o livro inteiro.
+    """
+    
+    def __init__(self, output_path, jsonl_path=None):
+        self.blocks = {}
+        self.records = {}
+        self._map = None
+        self._jsonl = None
+        
+        try:
+            with open(output_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            pass
+        if self._map is not None:
+            banners = list(PAGE_BANNER_RE.finditer(self._map))
+            ends = [m.start() for m in banners[1:]] + [len(self._map)]
+            for banner, end in zip(banners, ends):
+                self.blocks[int(banner.group(1))] = (banner.end(), end)
+        
+        if jsonl_path is not None:
+            try:
+                self._jsonl = open(jsonl_path, 'rb')
+            except FileNotFoundError:
+                return
+            offset = 0
+            for line in self._jsonl:
+                if line.strip():
+                    self.records[json.loads(line)['page']] = offset
+                offset += len(line)
+    
+    def pages(self):
+        """Páginas com texto no .txt existente"""
+        return self.blocks.keys()
+    
+    def text(self, page_num):
+        """Texto de uma página do .txt existente ('' se ausente)"""
+        if page_num not in self.blocks:
+            return ''
+        start, end = self.blocks[page_num]
+        return self._map[start:end].decode('utf-8')
+    
+    def record(self, page_num):
+        """Registro de uma página do .jsonl existente (None se ausente)"""
+        if page_num not in self.records:
+            return None
+        self._jsonl.seek(self.records[page_num])
+        return json.loads(self._jsonl.readline())
+    
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        if self._jsonl is not None:
+            self._jsonl.close()
+
+class OutputWriter:
+    """
+    Grava a saída página a página, em ordem, à medida que as páginas ficam prontas
+    
+    As páginas terminam fora de ordem; cada uma é escrita assim que todas as
+    anteriores já foram. Uma página adiantada não fica em memória: quando chega
+    a sua vez, `load_page(página)` a relê (do checkpoint) e retorna (texto,
+    registro JSONL). Tudo vai para arquivos .tmp que só substituem a saída
+    (os.replace) no fim, então uma execução interrompida nunca deixa um .txt
+    truncado no lugar do anterior.
+    """
+    
+    def __init__(self, output_path, load_page, jsonl_path=None):
+        self.targets = [output_path] + ([jsonl_path] if jsonl_path else [])
+        self.load_page = load_page
+        self.next_page = 1
+        self.pages_with_text = 0
+        self.chars = 0
+        self.lines = 0
+        self.committed = False
+        self.seconds = 0.0
+        self._ready = set()
+        self._last_char = ''
+        self._txt, self._jsonl = [
+            open(self._tmp_path(path), 'w', encoding='utf-8') for path in self.targets
+        ] + [None] * (2 - len(self.targets))
+    
+    def _tmp_path(self, path):
+        return path.with_name(path.name + '.tmp')
+    
+    def _count(self, chunk):
+        """Atualiza caracteres e linhas como se o texto inteiro passasse por splitlines()"""
+        lines = len(chunk.splitlines())
+        # A primeira linha do trecho continua a última do anterior (ou completa um '\r\n')
+        if self._last_char and (len((self._last_char + 'x').splitlines()) == 1
+                                or self._last_char + chunk[0] == '\r\n'):
+            lines -= 1
+        self.lines += lines
+        self.chars += len(chunk)
+        self._last_char = chunk[-1]
+    
+    def page_ready(self, page_num):
+        """Marca uma página como concluída e grava todas as que já podem sair em ordem"""
+        started = time.perf_counter()
+        self._ready.add(page_num)
+        while self.next_page in self._ready:
+            self._ready.discard(self.next_page)
+            self._write(self.next_page)
+            self.next_page += 1
+        self.seconds += time.perf_counter() - started
+    
+    def _write(self, page_num):
+        text, record = self.load_page(page_num)
+        if text:
+            chunk = '\n'.join(format_page(page_num, text))
+            if self.pages_with_text:
+                chunk = '\n' + chunk
+            self._count(chunk)
+            self._txt.write(chunk)
+            self.pages_with_text += 1
+        if self._jsonl is not None:
+            self._jsonl.write(json.dumps(record, ensure_ascii=False) + '\n')
+    
+    def commit(self):
+        """Fecha os arquivos e substitui a saída anterior"""
+        started = time.perf_counter()
+        for f, path in zip((self._txt, self._jsonl), self.targets):
+            f.close()
+            os.replace(self._tmp_path(path), path)
+        self.committed = True
+        self.seconds += time.perf_counter() - started
+    
+    def abort(self):
+        """Descarta os arquivos .tmp de uma execução que falhou"""
+        for f, path in zip((self._txt, self._jsonl), self.targets):
+            f.close()
+            self._tmp_path(path).unlink(missing_ok=True)
+
+def extract_text_from_pdf(pdf_path, output_path=None, language='ita', jobs=None,
+                          stream=False, window=None, psm=3, oem=3, cache=None,
+                          resume=False, hybrid=False, min_text_chars=50,
+                          dpi=300, adaptive=False, fast_dpi=150, fast_psm=6,
+                          min_confidence=80, io='file', resident=False,
+                          engine=None, pool=None, log_prefix='', pages=None,
+                          jsonl=False, metrics=None, render_mode='color', render_shards=None,
+                          page_timeout=300, retries=1, retry_psm=6, screen=False,
+                          blank_ink=0.002, dup_distance=16, auto_language=False, language_dpi=100):
     """
     Extrai texto de um PDF escaneado usando OCR
     
@@ -17,129 +1713,770 @@ def extract_text_from_pdf(pdf_path, output_path=None, language='ita'):
         pdf_path: Caminho para o arquivo PDF
         output_path: Caminho para salvar o texto extraído (opcional)
         language: Idioma para OCR (padrão: 'ita' para italiano)
+        jobs: Número de páginas processadas em paralelo (padrão: nº de CPUs)
+        stream: Renderiza e faz OCR página a página em vez de rasterizar o PDF inteiro antes
+        window: Máximo de imagens à espera do OCR ou, no modo adaptativo, de
+            páginas em andamento (padrão: 2 × jobs)
+        psm: Page segmentation mode do tesseract (padrão: 3)
+        oem: OCR engine mode do tesseract (padrão: 3)
+        cache: OcrCache para reaproveitar páginas já processadas (opcional)
+        resume: Retoma a partir do checkpoint de uma execução interrompida
+        hybrid: Usa a camada de texto embutida do PDF nas páginas em que ela é boa
+            o bastante e faz OCR apenas nas demais
+        min_text_chars: Mínimo de caracteres para aceitar a camada de texto de uma página
+        dpi: Resolução de renderização das páginas (padrão: 300)
+        adaptive: Passada rápida em baixa resolução; só as páginas de baixa
+            confiança são repetidas em `dpi`
+        fast_dpi: Resolução da passada rápida do modo adaptativo (padrão: 150)
+        fast_psm: Page segmentation mode da passada rápida (padrão: 6)
+        min_confidence: Confiança média mínima para aceitar a passada rápida (padrão: 80)
+        io: 'file' grava cada página como PNG em temp_ocr/; 'pipe' passa a imagem
+            do pdftoppm ao tesseract em memória, sem arquivos (implica stream)
+        resident: Usa a libtesseract carregada no processo, com uma instância
+            inicializada por worker, em vez de um processo tesseract por página
+        engine: OcrEngine compartilhado entre vários PDFs (opcional; quem o criou
+            é responsável por fechá-lo e por relatar o cache)
+        pool: ThreadPoolExecutor compartilhado entre vários PDFs (opcional)
+        log_prefix: Prefixo das linhas de progresso (identifica o PDF em lote)
+        pages: Conjunto de páginas a processar (opcional). As demais páginas são
+            mantidas como estão no arquivo de saída existente, e o texto novo é
+            encaixado nos cabeçalhos 'PÁGINA N' correspondentes
+        jsonl: Grava também <saida>.jsonl com um registro por página (texto,
+            origem, confiança e linhas/palavras com caixas), obtido da mesma
+            execução do tesseract que produz o texto
+        metrics: Caminho de um .json para gravar os tempos de cada página
+            (renderização, OCR, caracteres, imagem, worker) e de cada fase
+        render_mode: Imagens de página em 'color' (24 bits), 'gray' (8 bits)
+            ou 'mono' (1 bit)
+        render_shards: Intervalos de páginas rasterizados em paralelo no modo
+            padrão (padrão: jobs ÷ 4, no mínimo 1)
+        page_timeout: Segundos máximos de renderização ou OCR de uma página; o
+            processo travado é morto (padrão: 300; None desativa)
+        retries: Novas tentativas de uma página após timeout ou erro (padrão: 1)
+        retry_psm: Page segmentation mode das novas tentativas (padrão: 6)
+        screen: Triagem antes do OCR com miniaturas: páginas em branco são
+            puladas e páginas duplicadas (imagem idêntica à da original)
+            reaproveitam o texto da original
+        blank_ink: Cobertura de tinta abaixo da qual a página está em branco
+            (padrão: 0.002, 0,2% dos pixels)
+        dup_distance: Bits de diferença no hash perceptual até os quais duas
+            páginas são comparadas pela imagem completa (padrão: 16 de 1024)
+        auto_language: Com vários idiomas em `language` (ex.: 'ita+por'),
+            identifica o idioma de cada página numa passada rápida e faz o OCR
+            completo só com o modelo dele
+        language_dpi: Resolução da passada de identificação de idioma (padrão: 100)
+    
+    Páginas que esgotam as tentativas ficam vazias na saída, são listadas no
+    relatório final e permanecem pendentes no checkpoint (--resume as refaz);
+    as demais páginas seguem normalmente.
+    
+    Cada página é gravada na saída assim que ela e as anteriores estão prontas,
+    então a memória usada fica limitada a uma página, qualquer que seja o
+    tamanho do livro.
     
     Returns:
-        Texto extraído do PDF
+        Dicionário com 'output' (caminho do .txt), 'pages' (páginas com texto),
+        'chars' e 'lines' da saída, 'metrics' (resumo de OcrMetrics) e
+        'failed_pages' ({página: motivo})
     """
     pdf_path = Path(pdf_path)
+    jobs = max(1, jobs or default_jobs())
+    run_metrics = OcrMetrics(pdf_path, jobs)
+    window = max(1, window or 2 * jobs)
     
     if not pdf_path.exists():
         print(f"❌ Erro: Arquivo não encontrado: {pdf_path}")
         sys.exit(1)
     
-    # Criar diretório temporário para imagens
-    temp_dir = pdf_path.parent / 'temp_ocr'
-    temp_dir.mkdir(exist_ok=True)
+    if output_path:
+        output_path = Path(output_path)
+    else:
+        output_path = pdf_path.with_suffix('.txt')
+    jsonl_path = output_path.with_suffix('.jsonl')
+    
+    # Criar diretório temporário para imagens (descartando sobras de uma execução morta)
+    temp_dir = pdf_path.parent / 'temp_ocr' / pdf_path.stem
+    cleanup_temp_dir(temp_dir)
+    temp_dir.mkdir(parents=True, exist_ok=True)
     
     print(f"📄 Processando: {pdf_path.name}")
     print(f"🌍 Idioma OCR: {language}")
+    print(f"⚙️  Workers de OCR: {jobs}")
+    if render_mode != 'color':
+        print(f"🎨 Renderização: {RENDER_MODE_NAMES[render_mode]}")
+    if cache is not None:
+        print(f"🗄️  Cache de OCR: {cache.cache_dir}")
     print(f"📁 Diretório temporário: {temp_dir}")
     
+    checkpoint = OcrCheckpoint(output_path, pdf_path)
+    existing = None
+    writer = None
+    own_engine = engine is None
+    own_pool = pool is None
+    if own_pool:
+        pool = ThreadPoolExecutor(max_workers=jobs)
+    
     try:
-        # Passo 1: Converter PDF para imagens (uma por página)
-        print("\n🔄 Passo 1/3: Convertendo PDF para imagens...")
-        images_prefix = temp_dir / 'page'
-        cmd_convert = [
-            'pdftoppm',
-            '-png',
-            '-r', '300',  # DPI (maior = melhor qualidade)
-            str(pdf_path),
-            str(images_prefix)
-        ]
-        subprocess.run(cmd_convert, check=True, capture_output=True)
+        if own_engine:
+            engine = create_engine(language, psm, oem, cache, resident, layout=jsonl, timeout=page_timeout)
+        if own_engine and isinstance(engine, ResidentOcrEngine):
+            print(f"🔥 Engine residente: libtesseract carregada no processo ({engine.version()})")
+        # página → origem do texto ('ocr' ou 'text-layer'); o texto fica no checkpoint
+        sources = checkpoint.open(resume)
+        if resume:
+            print(f"⏯️  Retomando: {len(sources)} páginas já concluídas em {checkpoint.checkpoint_dir}")
         
-        # Listar imagens geradas
-        image_files = sorted(temp_dir.glob('page-*.png'))
-        total_pages = len(image_files)
-        print(f"✅ {total_pages} páginas convertidas para imagens")
+        total_pages = get_page_count(pdf_path)
         
-        # Passo 2: Executar OCR em cada imagem
-        print(f"\n🔍 Passo 2/3: Executando OCR em {total_pages} páginas...")
-        all_text = []
+        def load_page(page_num):
+            """(texto, registro JSONL) de uma página concluída ou mantida da saída existente"""
+            if page_num in sources:
+                text = checkpoint.read_text(page_num)
+                if not jsonl:
+                    return text, None
+                return text, page_record(page_num, text, sources[page_num], checkpoint.read_layout(page_num),
+                                         checkpoint.duplicates.get(page_num),
+                                         checkpoint.languages.get(page_num),
+                                         checkpoint.language_scores.get(page_num))
+            text = existing.text(page_num) if existing is not None else ''
+            if not jsonl:
+                return text, None
+            return text, (existing and existing.record(page_num)) or page_record(page_num, text)
         
-        for i, image_file in enumerate(image_files, 1):
-            print(f"  📖 Processando página {i}/{total_pages}...", end=' ')
-            
-            # Executar tesseract
-            cmd_ocr = [
-                'tesseract',
-                str(image_file),
-                'stdout',
-                '-l', language,
-                '--psm', '3',  # Page segmentation mode: Fully automatic
-                '--oem', '3'   # OCR Engine mode: Default (best available)
-            ]
-            
-            result = subprocess.run(cmd_ocr, capture_output=True, text=True)
-            page_text = result.stdout.strip()
-            
-            if page_text:
-                all_text.append(f"\n{'='*80}\n")
-                all_text.append(f"PÁGINA {i}\n")
-                all_text.append(f"{'='*80}\n\n")
-                all_text.append(page_text)
-                print(f"✅ ({len(page_text)} caracteres)")
-            else:
-                print("⚠️  (texto vazio)")
+        writer = OutputWriter(output_path, load_page, jsonl_path if jsonl else None)
+        done = set(sources)
+        
+        if pages is not None:
+            # Só as páginas pedidas são processadas; as outras vêm da saída existente
+            selected = {p for p in pages if 1 <= p <= total_pages}
+            existing = ExistingOutput(output_path, jsonl_path if jsonl else None)
+            for page_num in range(1, total_pages + 1):
+                if page_num not in selected and page_num not in sources:
+                    done.add(page_num)
+            kept = len(existing.pages() - selected)
+            print(f"📑 Páginas selecionadas: {len(selected)} ({kept} páginas mantidas de {output_path.name})")
+        
+        for page_num in sorted(done):
+            writer.page_ready(page_num)
         
-        # Passo 3: Salvar resultado
-        combined_text = '\n'.join(all_text)
+        candidates = [lang for lang in language.split('+') if lang in LANGUAGE_STOPWORDS]
+        if auto_language and len(candidates) < 2:
+            print(f"⚠️  --auto-language precisa de dois ou mais idiomas conhecidos "
+                  f"({', '.join(LANGUAGE_STOPWORDS)}), ex.: ita+por; usando '{language}' em todas as páginas")
+            auto_language = False
         
-        if output_path:
-            output_path = Path(output_path)
+        if hybrid:
+            # Páginas com camada de texto utilizável não passam pelo OCR
+            print(f"\n📝 Verificando camada de texto embutida...")
+            started = time.perf_counter()
+            text_pages = 0
+            for page_num, layer_text in extract_text_layer(pdf_path):
+                if page_num in done or page_num > total_pages:
+                    continue
+                if text_layer_is_usable(layer_text, min_text_chars):
+                    guess = detect_language(layer_text, candidates) if auto_language else LanguageGuess(None, None)
+                    checkpoint.record(page_num, layer_text, 0.0, source='text-layer', language=guess.language,
+                                      language_scores=guess.scores)
+                    sources[page_num] = 'text-layer'
+                    done.add(page_num)
+                    writer.page_ready(page_num)
+                    text_pages += 1
+            run_metrics.phase('text_layer', time.perf_counter() - started)
+            print(f"✅ {text_pages} páginas com texto embutido; {total_pages - len(done)} precisam de OCR")
+        
+        pending = [p for p in range(1, total_pages + 1) if p not in done]
+        
+        # duplicata → original; o texto da original é copiado quando o OCR dela termina
+        duplicates = {}
+        if screen and pending:
+            print(f"\n🔎 Triagem de páginas em branco e duplicadas ({len(pending)} miniaturas)...")
+            started = time.perf_counter()
+            try:
+                blank, duplicates = screen_pages(pdf_path, pending, blank_ink, dup_distance, page_timeout,
+                                                 dpi, render_mode)
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired, ValueError) as e:
+                print(f"⚠️  Triagem interrompida ({e}); todas as páginas passam pelo OCR")
+                blank, duplicates = {}, {}
+            for page_num in sorted(blank):
+                checkpoint.record(page_num, '', 0.0, source='blank')
+                sources[page_num] = 'blank'
+                done.add(page_num)
+                writer.page_ready(page_num)
+            pending = [p for p in pending if p not in blank and p not in duplicates]
+            run_metrics.screened(blank, duplicates)
+            run_metrics.phase('screen', time.perf_counter() - started)
+            print(f"✅ {len(blank)} páginas em branco, {len(duplicates)} duplicadas; "
+                  f"{len(pending)} precisam de OCR")
+        copies = {}
+        for page_num, original in sorted(duplicates.items()):
+            copies.setdefault(original, []).append(page_num)
+        
+        page_engine = engine
+        page_languages = {}
+        if auto_language and pending:
+            print(f"\n🌍 Identificando o idioma de {len(pending)} páginas "
+                  f"({language_dpi} DPI, modelo '{candidates[0]}')...")
+            started = time.perf_counter()
+            page_languages = detect_page_languages(pdf_path, pending, engine, pool, candidates,
+                                                   language_dpi, fast_psm, page_timeout)
+            page_engine = PageLanguageEngine(engine, page_languages)
+            run_metrics.phase('language', time.perf_counter() - started)
+            counts = {}
+            for guess in page_languages.values():
+                counts[guess.language or language] = counts.get(guess.language or language, 0) + 1
+            print("✅ " + ', '.join(f"{count} páginas em '{lang}'" for lang, count in sorted(counts.items())))
+        
+        if io == 'pipe':
+            renderer = PipeRenderer(pdf_path, render_mode, page_timeout)
+            stream = True
         else:
-            output_path = pdf_path.with_suffix('.txt')
+            renderer = FileRenderer(pdf_path, temp_dir, render_mode, page_timeout)
         
+        adaptive_ocr = None
+        if adaptive:
+            # Cada página é renderizada e processada dentro do próprio worker
+            adaptive_ocr = AdaptiveOcr(page_engine, renderer, dpi, fast_dpi, fast_psm, min_confidence,
+                                       retries, retry_psm)
+            print(f"\n🔄 Passo 1/3: Renderizando {len(pending)} páginas sob demanda "
+                  f"({adaptive_ocr.fast_dpi} DPI, {dpi} DPI se a confiança for baixa)...")
+            print(f"\n🔍 Passo 2/3: Executando OCR adaptativo em {len(pending)} páginas...")
+            results = adaptive_ocr.pages(pending, pool, window)
+        elif stream:
+            # Passo 1 e 2 sobrepostos: cada página é renderizada e enviada ao OCR
+            where = 'em memória' if io == 'pipe' else 'em disco'
+            print(f"\n🔄 Passo 1/3: Renderizando {len(pending)} páginas sob demanda (janela de {window} imagens {where})...")
+            print(f"\n🔍 Passo 2/3: Executando OCR em {len(pending)} páginas...")
+            results = ocr_pages_streaming(renderer, pending, page_engine, pool, window, dpi, retries, retry_psm)
+        else:
+            # Passo 1 e 2 sobrepostos: intervalos de páginas renderizados em paralelo,
+            # cada página vai para o OCR (até `jobs` por vez) assim que é gravada
+            shards = render_shards or max(1, jobs // 4)
+            ranges = shard_ranges(pending, shards)
+            print(f"\n🔄 Passo 1/3: Convertendo {len(pending)} páginas para imagens "
+                  f"em {len(ranges)} intervalo(s) paralelo(s), janela de {window} imagens em disco...")
+            print(f"\n🔍 Passo 2/3: Executando OCR em {len(pending)} páginas à medida que ficam prontas...")
+            results = ocr_pages_sharded(pdf_path, temp_dir, pending, page_engine, pool, shards, window, dpi,
+                                        render_mode, page_timeout, retries, retry_psm)
+        
+        started = time.perf_counter()
+        write_before = writer.seconds
+        failed_pages = {}
+        count = len(done)
+        for result in results:
+            run_metrics.add_page(result)
+            page_text = result.text
+            # A página do OCR e as suas duplicatas, que recebem o mesmo texto
+            for i in [result.page] + copies.get(result.page, []):
+                count += 1
+                duplicate_of = duplicates.get(i)
+                if result.error:
+                    source = 'failed'
+                else:
+                    source = 'duplicate' if duplicate_of else 'ocr'
+                seconds = 0.0 if duplicate_of else result.seconds
+                guess = page_languages.get(result.page, LanguageGuess(None, None))
+                page_language = (guess.language or language) if auto_language else None
+                checkpoint.record(i, page_text, seconds, source, result.layout, duplicate_of, page_language,
+                                  guess.scores)
+                sources[i] = source
+                writer.page_ready(i)
+                
+                if result.error:
+                    failed_pages[i] = result.error
+                    print(f"  {log_prefix}📖 Página {i}/{total_pages} [{count}/{total_pages}] ❌ ({result.error})")
+                elif duplicate_of:
+                    print(f"  {log_prefix}📖 Página {i}/{total_pages} [{count}/{total_pages}] 🔁 "
+                          f"(duplicata da página {duplicate_of})")
+                elif page_text:
+                    print(f"  {log_prefix}📖 Página {i}/{total_pages} [{count}/{total_pages}] ✅ ({len(page_text)} caracteres)")
+                else:
+                    print(f"  {log_prefix}📖 Página {i}/{total_pages} [{count}/{total_pages}] ⚠️  (texto vazio)")
+        
+        run_metrics.phase('ocr', time.perf_counter() - started - (writer.seconds - write_before))
+        
+        if adaptive_ocr is not None:
+            adaptive_ocr.print_report()
+        
+        if own_engine and cache is not None:
+            print(f"\n♻️  Cache: {cache.hits} resultados reaproveitados, {cache.misses} execuções do tesseract")
+            removed = cache.evict()
+            if removed:
+                print(f"🧹 Cache: {removed} entradas antigas removidas")
+        
+        # Passo 3: as páginas já foram gravadas em ordem; falta substituir a saída
         print(f"\n💾 Passo 3/3: Salvando texto extraído...")
-        output_path.write_text(combined_text, encoding='utf-8')
+        writer.commit()
+        if not failed_pages:
+            checkpoint.remove()
+        run_metrics.phase('write', writer.seconds)
         
-        print(f"✅ Texto salvo em: {output_path}")
-        print(f"📊 Total de caracteres: {len(combined_text):,}")
-        print(f"📊 Total de linhas: {len(combined_text.splitlines()):,}")
+        print(f"✅ {log_prefix}Texto salvo em: {output_path}")
+        if jsonl:
+            print(f"✅ {log_prefix}Páginas estruturadas salvas em: {jsonl_path}")
+        print(f"📊 Total de caracteres: {writer.chars:,}")
+        print(f"📊 Total de linhas: {writer.lines:,}")
+        if run_metrics.blank_pages:
+            print(f"⬜ Páginas em branco (sem OCR): {', '.join(map(str, run_metrics.blank_pages))}")
+        if run_metrics.duplicate_pages:
+            pairs = ', '.join(f"{page}→{original}" for page, original in run_metrics.duplicate_pages.items())
+            print(f"🔁 Páginas duplicadas (texto reaproveitado): {pairs}")
+        run_metrics.languages = dict(checkpoint.languages)
+        run_metrics.language_scores = dict(checkpoint.language_scores)
+        if auto_language and checkpoint.languages:
+            by_language = {}
+            for page_num, page_language in checkpoint.languages.items():
+                by_language.setdefault(page_language, []).append(page_num)
+            print("🌍 Idioma por página: " + '; '.join(
+                f"{lang} {format_page_ranges(pages_of)}" for lang, pages_of in sorted(by_language.items())))
         
-        # Limpar arquivos temporários
-        print(f"\n🧹 Limpando arquivos temporários...")
-        for img in image_files:
-            img.unlink()
-        temp_dir.rmdir()
+        if failed_pages:
+            print(f"\n❌ {log_prefix}{len(failed_pages)} páginas falharam e ficaram vazias na saída:")
+            for page_num in sorted(failed_pages):
+                print(f"   • Página {page_num}: {failed_pages[page_num]}")
+            print(f"💡 Checkpoint mantido em {checkpoint.checkpoint_dir}; "
+                  f"execute novamente com --resume para refazer só essas páginas")
         
-        return combined_text
+        if metrics:
+            summary = run_metrics.write(metrics)
+            print(f"📈 {log_prefix}Métricas salvas em: {metrics} "
+                  f"({summary['pages_ocr']} páginas de OCR, {summary['pages_per_second'] or 0:.2f} páginas/s)")
+        else:
+            summary = run_metrics.summary()
         
+        return {
+            'output': output_path,
+            'pages': writer.pages_with_text,
+            'chars': writer.chars,
+            'lines': writer.lines,
+            'metrics': summary,
+            'failed_pages': failed_pages
+        }
+    
     except subprocess.CalledProcessError as e:
-        print(f"❌ Erro ao executar comando: {e}")
+        print(f"❌ {log_prefix}Erro ao executar comando: {e}")
         print(f"Saída: {e.output if hasattr(e, 'output') else 'N/A'}")
+        print(f"💡 Progresso salvo em {checkpoint.checkpoint_dir}; execute novamente com --resume")
         sys.exit(1)
     except Exception as e:
-        print(f"❌ Erro inesperado: {e}")
+        print(f"❌ {log_prefix}Erro inesperado: {e}")
+        print(f"💡 Progresso salvo em {checkpoint.checkpoint_dir}; execute novamente com --resume")
         sys.exit(1)
+    finally:
+        # Limpar arquivos temporários (também em caso de erro)
+        print(f"\n🧹 Limpando arquivos temporários...")
+        cleanup_temp_dir(temp_dir)
+        if writer is not None and not writer.committed:
+            writer.abort()
+        if existing is not None:
+            existing.close()
+        if own_pool:
+            pool.shutdown(cancel_futures=True)
+        if own_engine and engine is not None:
+            engine.close()
 
-def main():
-    if len(sys.argv) < 2:
-        print("Uso: python3 extract_pdf_ocr.py <arquivo.pdf> [saida.txt] [idioma]")
-        print("\nExemplo:")
-        print("  python3 extract_pdf_ocr.py ItalB1-25.pdf")
-        print("  python3 extract_pdf_ocr.py ItalB1-25.pdf saida.txt ita")
-        print("\nIdiomas suportados:")
-        print("  ita = Italiano")
-        print("  eng = Inglês")
-        print("  por = Português")
+def compare_render_modes(pdf_path, language='ita', jobs=None, psm=3, oem=3, dpi=300,
+                         pages=None, resident=False, modes=('color', 'gray', 'mono'),
+                         report_path=None):
+    """
+    Compara os modos de renderização em throughput e no texto produzido
+    
+    Cada modo renderiza e faz OCR das mesmas páginas (todas, ou `pages`), sem
+    cache, pelo mesmo caminho do --stream. O relatório mostra, por modo,
+    páginas/s, tempo somado de renderização e de OCR, tamanho médio das
+    imagens, caracteres produzidos e a similaridade do texto com o do modo em
+    cor (difflib, 0-1). Com `report_path` o resultado também vai para um JSON.
+    
+    Returns:
+        Lista com um dicionário por modo
+    """
+    pdf_path = Path(pdf_path)
+    jobs = max(1, jobs or default_jobs())
+    total_pages = get_page_count(pdf_path)
+    page_numbers = sorted(p for p in (pages or range(1, total_pages + 1)) if 1 <= p <= total_pages)
+    temp_dir = pdf_path.parent / 'temp_ocr' / f"{pdf_path.stem}-compare"
+    
+    print(f"📄 Comparando modos de renderização: {pdf_path.name}")
+    print(f"📑 {len(page_numbers)} páginas, {dpi} DPI, {jobs} workers, sem cache")
+    
+    report = []
+    reference = None
+    engine = create_engine(language, psm, oem, None, resident)
+    try:
+        for mode in modes:
+            cleanup_temp_dir(temp_dir)
+            temp_dir.mkdir(parents=True, exist_ok=True)
+            print(f"\n🎨 {RENDER_MODE_NAMES[mode]}...")
+            
+            renderer = FileRenderer(pdf_path, temp_dir, mode)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                results = list(ocr_pages_streaming(renderer, page_numbers, engine, pool, 2 * jobs, dpi))
+            elapsed = time.perf_counter() - started
+            
+            texts = {r.page: r.text for r in results}
+            measured = [r for r in results if r.metrics]
+            if reference is None:
+                reference = texts
+            similarity = [
+                difflib.SequenceMatcher(None, reference[p], texts[p], autojunk=False).ratio()
+                for p in page_numbers
+            ]
+            report.append({
+                'mode': mode,
+                'pages': len(results),
+                'wall_seconds': round(elapsed, 3),
+                'pages_per_second': round(len(results) / elapsed, 3) if elapsed > 0 else None,
+                'render_seconds': round(sum(r.metrics['render_seconds'] for r in measured), 3),
+                'ocr_seconds': round(sum(r.metrics['ocr_seconds'] for r in measured), 3),
+                'mean_image_bytes': round(sum(r.metrics['image_bytes'] for r in measured) / max(1, len(measured))),
+                'failed_pages': sorted(r.page for r in results if r.error),
+                'chars': sum(len(t) for t in texts.values()),
+                'similarity_to_color': round(sum(similarity) / max(1, len(similarity)), 4)
+            })
+    finally:
+        cleanup_temp_dir(temp_dir)
+        engine.close()
+    
+    print("\n" + "="*80)
+    print("🎨 COMPARAÇÃO DE MODOS DE RENDERIZAÇÃO")
+    print("="*80)
+    base = report[0]
+    for row in report:
+        speedup = (row['pages_per_second'] or 0) / (base['pages_per_second'] or 1)
+        print(f"   • {RENDER_MODE_NAMES[row['mode']]}: {row['pages_per_second'] or 0:.2f} páginas/s "
+              f"({speedup:.2f}×), render {row['render_seconds']:.1f}s, OCR {row['ocr_seconds']:.1f}s, "
+              f"imagem média {row['mean_image_bytes'] / 1024:.0f} KB, {row['chars']:,} caracteres, "
+              f"similaridade {row['similarity_to_color']:.3f}")
+    
+    if report_path:
+        Path(report_path).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"📈 Comparação salva em: {report_path}")
+    return report
+
+def is_batch_input(pdf_path):
+    """Diretório ou padrão glob (ex.: 'cils/*.pdf') ativam o modo em lote; um arquivo existente nunca"""
+    if Path(pdf_path).is_file():
+        return False
+    return Path(pdf_path).is_dir() or any(c in str(pdf_path) for c in '*?[')
+
+def find_pdfs(pattern):
+    """Lista os PDFs de um diretório ou de um padrão glob, em ordem alfabética"""
+    if Path(pattern).is_dir():
+        candidates = Path(pattern).iterdir()
+    else:
+        candidates = (Path(p) for p in glob.glob(pattern, recursive=True))
+    return sorted(p for p in candidates if p.is_file() and p.suffix.lower() == '.pdf')
+
+def is_up_to_date(pdf_path, output_path):
+    """A saída existe, é mais nova que o PDF e não há execução interrompida pendente"""
+    if not output_path.exists() or Path(f"{output_path}.ocr-checkpoint").exists():
+        return False
+    return output_path.stat().st_mtime >= pdf_path.stat().st_mtime
+
+def extract_batch(pattern, output_dir=None, language='ita', jobs=None, files_in_flight=2,
+                  force=False, psm=3, oem=3, cache=None, resident=False, metrics=None,
+                  page_timeout=300, **options):
+    """
+    Extrai texto de todos os PDFs de um diretório ou padrão glob
+    
+    Todas as páginas de todos os PDFs vão para um único pool de `jobs` workers;
+    até `files_in_flight` PDFs são coordenados ao mesmo tempo, de modo que as
+    páginas do próximo arquivo já ocupam os workers enquanto as últimas do
+    anterior terminam. O engine de OCR (e o cache) também é compartilhado.
+    PDFs cuja saída .txt já está atualizada são pulados (a menos que `force`).
+    Com `metrics`, as métricas de todos os PDFs vão para um único .json.
+    Uma página problemática não interrompe o lote: ela falha sozinha depois de
+    `page_timeout` segundos e das novas tentativas (ver extract_text_from_pdf).
+    
+    Os demais `options` são repassados para extract_text_from_pdf.
+    
+    Returns:
+        Dicionário {'processed': [...], 'skipped': [...], 'failed': [...]} com os PDFs
+        e 'failed_pages' ({pdf: [páginas]}) dos PDFs processados com páginas em falha
+    """
+    jobs = max(1, jobs or default_jobs())
+    pdfs = find_pdfs(pattern)
+    if not pdfs:
+        print(f"❌ Nenhum PDF encontrado em: {pattern}")
         sys.exit(1)
     
-    pdf_path = sys.argv[1]
-    output_path = sys.argv[2] if len(sys.argv) > 2 else None
-    language = sys.argv[3] if len(sys.argv) > 3 else 'ita'
+    # Em output_dir as saídas mantêm as subpastas sob a raiz comum dos PDFs, para que
+    # rb/2019/sessione.pdf e rb/2020/sessione.pdf (glob recursivo) não disputem o mesmo .txt
+    root = Path(os.path.commonpath([p.parent for p in pdfs]))
+    if output_dir:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+    
+    report = {'processed': [], 'skipped': [], 'failed': [], 'failed_pages': {}}
+    todo = []
+    for pdf_path in pdfs:
+        if output_dir:
+            output_path = (output_dir / pdf_path.relative_to(root)).with_suffix('.txt')
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+        else:
+            output_path = pdf_path.with_suffix('.txt')
+        if not force and is_up_to_date(pdf_path, output_path):
+            report['skipped'].append(pdf_path)
+            print(f"⏭️  Atualizado, pulando: {pdf_path.name}")
+        else:
+            todo.append((pdf_path, output_path))
+    
+    print(f"\n📚 {len(todo)} PDFs para processar ({len(report['skipped'])} já atualizados)")
+    print(f"⚙️  Pool global: {jobs} workers, até {files_in_flight} PDFs em andamento")
+    
+    started = time.perf_counter()
+    total_pages = 0
+    file_metrics = []
+    engine = create_engine(language, psm, oem, cache, resident, layout=options.get('jsonl', False),
+                           timeout=page_timeout)
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool, \
+                ThreadPoolExecutor(max_workers=max(1, files_in_flight)) as files:
+            futures = {
+                files.submit(
+                    extract_text_from_pdf, pdf_path, output_path, language, jobs=jobs,
+                    psm=psm, oem=oem, cache=cache, engine=engine, pool=pool,
+                    log_prefix=f"[{pdf_path.relative_to(root).with_suffix('')}] ", page_timeout=page_timeout, **options
+                ): pdf_path
+                for pdf_path, output_path in todo
+            }
+            
+            for future in as_completed(futures):
+                pdf_path = futures[future]
+                try:
+                    result = future.result()
+                except SystemExit:
+                    report['failed'].append(pdf_path)
+                    continue
+                report['processed'].append(pdf_path)
+                total_pages += result['pages']
+                file_metrics.append(result['metrics'])
+                if result['failed_pages']:
+                    report['failed_pages'][pdf_path] = sorted(result['failed_pages'])
+    finally:
+        engine.close()
+    
+    elapsed = time.perf_counter() - started
+    print("\n" + "="*80)
+    print("📚 RESUMO DO LOTE")
+    print("="*80)
+    print(f"   • Processados: {len(report['processed'])}")
+    print(f"   • Pulados (atualizados): {len(report['skipped'])}")
+    print(f"   • Com erro: {len(report['failed'])}")
+    for pdf_path in report['failed']:
+        print(f"     ❌ {pdf_path}")
+    if report['failed_pages']:
+        print(f"   • Com páginas em falha: {len(report['failed_pages'])}")
+        for pdf_path, failed in sorted(report['failed_pages'].items()):
+            print(f"     ⚠️  {pdf_path}: páginas {', '.join(map(str, failed))}")
+    print(f"   • Páginas com texto: {total_pages} em {elapsed:.1f}s"
+          + (f" ({total_pages / elapsed:.2f} páginas/s)" if elapsed > 0 else ""))
+    
+    if metrics:
+        pages_ocr = sum(m['pages_ocr'] for m in file_metrics)
+        summary = {
+            'jobs': jobs,
+            'files_in_flight': files_in_flight,
+            'wall_seconds': round(elapsed, 3),
+            'pages_ocr': pages_ocr,
+            'pages_per_second': round(pages_ocr / elapsed, 3) if elapsed > 0 else None,
+            'files': sorted(file_metrics, key=lambda m: m['pdf'])
+        }
+        Path(metrics).write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"📈 Métricas do lote salvas em: {metrics}")
+    
+    if cache is not None:
+        print(f"\n♻️  Cache: {cache.hits} resultados reaproveitados, {cache.misses} execuções do tesseract")
+        removed = cache.evict()
+        if removed:
+            print(f"🧹 Cache: {removed} entradas antigas removidas")
+    
+    return report
+
+def parse_args(argv=None):
+    """Interpreta os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(
+        description='Extrai texto de PDFs escaneados usando OCR (Tesseract)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=(
+            "Exemplo:\n"
+            "  python3 extract_pdf_ocr.py ItalB1-25.pdf\n"
+            "  python3 extract_pdf_ocr.py ItalB1-25.pdf saida.txt ita\n"
+            "  python3 extract_pdf_ocr.py ItalB1-25.pdf --jobs 4\n"
+            "  python3 extract_pdf_ocr.py ItalB1-25.pdf --stream --window 8\n"
+            "  python3 extract_pdf_ocr.py 'cils/*.pdf' textos/ --jobs 8\n"
+            "  python3 extract_pdf_ocr.py ItalB1-25.pdf --pages 86-174\n"
+            "  python3 extract_pdf_ocr.py ItalB1-25.pdf --screen\n"
+            "  python3 extract_pdf_ocr.py ItalB1-25.pdf saida.txt ita+por --auto-language\n"
+            "\nIdiomas suportados:\n"
+            "  ita = Italiano\n"
+            "  eng = Inglês\n"
+            "  por = Português"
+        )
+    )
+    parser.add_argument('pdf_path',
+                        help='arquivo PDF de entrada, ou diretório/padrão glob para processar em lote')
+    parser.add_argument('output_path', nargs='?', default=None,
+                        help='arquivo .txt de saída (padrão: mesmo nome do PDF); '
+                             'em lote, diretório de saída')
+    parser.add_argument('language', nargs='?', default='ita',
+                        help="idioma do OCR (padrão: ita)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help=f'páginas processadas em paralelo (padrão: {default_jobs()}, nº de CPUs '
+                             'disponíveis, considerando a cota do cgroup)')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='threads internas de cada tesseract (padrão: CPUs ÷ workers, ou '
+                             'OMP_THREAD_LIMIT se definido)')
+    parser.add_argument('--stream', action='store_true',
+                        help='renderiza e faz OCR página a página, apagando cada imagem após o uso')
+    parser.add_argument('--window', type=int, default=None,
+                        help='máximo de imagens à espera do OCR, em disco ou em memória, ou de páginas em '
+                             'andamento com --adaptive (padrão: 2 × jobs)')
+    parser.add_argument('--psm', type=int, default=3,
+                        help='page segmentation mode do tesseract (padrão: 3)')
+    parser.add_argument('--oem', type=int, default=3,
+                        help='OCR engine mode do tesseract (padrão: 3)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='desativa o cache de OCR por página')
+    parser.add_argument('--cache-dir', default=None,
+                        help=f'diretório do cache de OCR (padrão: {default_cache_dir()})')
+    parser.add_argument('--cache-size', type=int, default=500,
+                        help='tamanho máximo do cache em MB (padrão: 500)')
+    parser.add_argument('--resume', action='store_true',
+                        help='retoma uma execução interrompida a partir do checkpoint')
+    parser.add_argument('--hybrid', action='store_true',
+                        help='usa o texto embutido do PDF quando bom o bastante; OCR só nas demais páginas')
+    parser.add_argument('--min-text-chars', type=int, default=50,
+                        help='mínimo de caracteres para aceitar o texto embutido de uma página (padrão: 50)')
+    parser.add_argument('--dpi', type=int, default=300,
+                        help='resolução de renderização das páginas (padrão: 300)')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='passada rápida em baixa resolução; repete em --dpi só as páginas de baixa confiança')
+    parser.add_argument('--fast-dpi', type=int, default=150,
+                        help='resolução da passada rápida do modo --adaptive (padrão: 150)')
+    parser.add_argument('--fast-psm', type=int, default=6,
+                        help='page segmentation mode da passada rápida (padrão: 6, bloco único)')
+    parser.add_argument('--min-confidence', type=float, default=80,
+                        help='confiança média mínima (0-100) para aceitar a passada rápida (padrão: 80)')
+    parser.add_argument('--io', choices=['file', 'pipe'], default='file',
+                        help="'pipe' envia cada página do pdftoppm ao tesseract em memória, sem arquivos temporários")
+    parser.add_argument('--engine', choices=['cli', 'resident'], default='cli',
+                        help="'resident' mantém a libtesseract carregada (uma instância por worker) "
+                             "em vez de iniciar um processo tesseract por página")
+    parser.add_argument('--pages', type=parse_page_ranges, default=None,
+                        help="processa só estas páginas (ex.: 86-174 ou 1,3,10-12) e as encaixa "
+                             "no arquivo de saída existente")
+    parser.add_argument('--jsonl', action='store_true',
+                        help='grava também <saida>.jsonl com uma linha por página: texto, origem, '
+                             'confiança e caixas de linhas e palavras')
+    parser.add_argument('--metrics', default=None, metavar='ARQUIVO.json',
+                        help='grava tempos por página (renderização, OCR, caracteres, imagem, worker) '
+                             'e por fase, com páginas/s')
+    parser.add_argument('--render-shards', type=int, default=None,
+                        help='intervalos de páginas rasterizados em paralelo pelo pdftoppm '
+                             '(padrão: jobs ÷ 4, no mínimo 1)')
+    parser.add_argument('--render', choices=list(RENDER_MODES), default='color',
+                        help="imagens de página em 'color' (24 bits, padrão), 'gray' (8 bits) "
+                             "ou 'mono' (1 bit)")
+    parser.add_argument('--compare-render', action='store_true',
+                        help='em vez de extrair, compara páginas/s e texto dos modos de --render '
+                             '(use --pages para limitar a amostra e --metrics para salvar em JSON)')
+    parser.add_argument('--page-timeout', type=float, default=300,
+                        help='segundos máximos de renderização ou OCR de uma página; o processo '
+                             'travado é morto (padrão: 300; 0 desativa)')
+    parser.add_argument('--retries', type=int, default=1,
+                        help='novas tentativas de uma página após timeout ou erro (padrão: 1)')
+    parser.add_argument('--retry-psm', type=int, default=6,
+                        help='page segmentation mode das novas tentativas (padrão: 6, bloco único)')
+    parser.add_argument('--screen', action='store_true',
+                        help='triagem antes do OCR com miniaturas: pula páginas em branco e reaproveita '
+                             'o texto de páginas duplicadas (hash perceptual, confirmado pela imagem completa)')
+    parser.add_argument('--blank-ink', type=float, default=0.002,
+                        help='fração de pixels com tinta abaixo da qual a página está em branco '
+                             '(padrão: 0.002)')
+    parser.add_argument('--dup-distance', type=int, default=16,
+                        help='bits de diferença (de 1024) no hash perceptual até os quais duas páginas '
+                             'são comparadas pela imagem completa, que precisa ser idêntica (padrão: 16)')
+    parser.add_argument('--auto-language', action='store_true',
+                        help='com vários idiomas (ex.: ita+por), identifica o idioma de cada página '
+                             'numa passada rápida e faz o OCR só com o modelo dele')
+    parser.add_argument('--language-dpi', type=int, default=100,
+                        help='resolução da passada de identificação de idioma (padrão: 100)')
+    parser.add_argument('--force', action='store_true',
+                        help='em lote, reprocessa também os PDFs cuja saída já está atualizada')
+    parser.add_argument('--files-in-flight', type=int, default=2,
+                        help='em lote, quantos PDFs são coordenados ao mesmo tempo (padrão: 2)')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    cache = None
+    if not args.no_cache:
+        cache = OcrCache(args.cache_dir or default_cache_dir(), args.cache_size * 1024 * 1024)
+    
+    options = {
+        'stream': args.stream,
+        'window': args.window,
+        'resume': args.resume,
+        'hybrid': args.hybrid,
+        'min_text_chars': args.min_text_chars,
+        'dpi': args.dpi,
+        'adaptive': args.adaptive,
+        'fast_dpi': args.fast_dpi,
+        'fast_psm': args.fast_psm,
+        'min_confidence': args.min_confidence,
+        'io': args.io,
+        'pages': args.pages,
+        'jsonl': args.jsonl,
+        'metrics': args.metrics,
+        'render_mode': args.render,
+        'render_shards': args.render_shards,
+        'page_timeout': args.page_timeout or None,
+        'retries': args.retries,
+        'retry_psm': args.retry_psm,
+        'screen': args.screen,
+        'blank_ink': args.blank_ink,
+        'dup_distance': args.dup_distance,
+        'auto_language': args.auto_language,
+        'language_dpi': args.language_dpi
+    }
     
     print("\n" + "="*80)
     print("🔍 EXTRAÇÃO DE TEXTO COM OCR (Tesseract)")
     print("="*80 + "\n")
     
-    text = extract_text_from_pdf(pdf_path, output_path, language)
+    jobs, _ = apply_cpu_plan(args.jobs, args.threads)
+    
+    if args.compare_render:
+        compare_render_modes(args.pdf_path, args.language, jobs=jobs, psm=args.psm,
+                             oem=args.oem, dpi=args.dpi, pages=args.pages,
+                             resident=args.engine == 'resident', report_path=args.metrics)
+        return
+    
+    if is_batch_input(args.pdf_path):
+        report = extract_batch(args.pdf_path, args.output_path, args.language, jobs=jobs,
+                               files_in_flight=args.files_in_flight, force=args.force,
+                               psm=args.psm, oem=args.oem, cache=cache,
+                               resident=args.engine == 'resident', **options)
+        if report['failed'] or report['failed_pages']:
+            sys.exit(1)
+        print("\n✅ Extração em lote concluída com sucesso!")
+        return
     
-    # Mostrar preview dos primeiros 500 caracteres
+    result = extract_text_from_pdf(args.pdf_path, args.output_path, args.language, jobs=jobs,
+                                   psm=args.psm, oem=args.oem, cache=cache,
+                                   resident=args.engine == 'resident', **options)
+    
+    # Mostrar preview dos primeiros 500 caracteres (lidos da saída, sem carregar o resto)
+    with open(result['output'], encoding='utf-8') as f:
+        text = f.read(501)
     print("\n" + "="*80)
     print("📝 PREVIEW DO TEXTO EXTRAÍDO:")
     print("="*80 + "\n")
     print(text[:500] + "..." if len(text) > 500 else text)
+    if result['failed_pages']:
+        print(f"\n⚠️  Extração concluída com {len(result['failed_pages'])} páginas em falha")
+        sys.exit(1)
     print("\n✅ Extração concluída com sucesso!")
 
 if __name__ == '__main__':
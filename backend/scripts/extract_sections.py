@@ -10,6 +10,8 @@ import json
 from pathlib import Path
 from typing import Dict, List, Tuple
 
+from page_index import PageIndex, PageRangeIndex
+
 class ContentOrganizer:
     def __init__(self, source_file: str, output_dir: str):
         self.source_file = Path(source_file)
@@ -104,49 +106,22 @@ class ContentOrganizer:
             }
         }
     
-    def read_content(self) -> str:
-        """Lê o conteúdo do arquivo fonte"""
-        with open(self.source_file, 'r', encoding='utf-8') as f:
-            return f.read()
-    
-    def extract_pages(self, content: str) -> Dict[int, str]:
-        """Extrai páginas individuais do conteúdo"""
-        pages = {}
-        current_page = None
-        current_content = []
-        
-        for line in content.split('\n'):
-            # Detectar nova página
-            page_match = re.match(r'^PÁGINA (\d+)$', line.strip())
-            if page_match:
-                # Salvar página anterior
-                if current_page is not None:
-                    pages[current_page] = '\n'.join(current_content)
-                
-                current_page = int(page_match.group(1))
-                current_content = []
-            elif current_page is not None:
-                current_content.append(line)
-        
-        # Salvar última página
-        if current_page is not None:
-            pages[current_page] = '\n'.join(current_content)
-        
-        return pages
+    def extract_pages(self) -> PageIndex:
+        """Indexa as páginas do arquivo fonte (o texto de cada uma é lido sob demanda)"""
+        return PageIndex(self.source_file)
     
-    def extract_module_content(self, pages: Dict[int, str], module_config: Dict) -> str:
-        """Extrai conteúdo de um módulo específico"""
-        start = module_config['start_page']
-        end = module_config['end_page']
+    def extract_module_contents(self, pages: PageIndex) -> Dict[str, str]:
+        """
+        Conteúdo de todos os módulos, numa única passada pelas páginas
         
-        content_parts = []
-        for page_num in range(start, end + 1):
-            if page_num in pages:
-                content_parts.append(f"=== PÁGINA {page_num} ===\n")
-                content_parts.append(pages[page_num])
-                content_parts.append("\n\n")
-        
-        return ''.join(content_parts)
+        Os intervalos vizinhos dividem páginas de borda (3-4, 4-8, ...); cada
+        página é lida uma vez e entregue a todos os módulos que a contêm.
+        """
+        ranges = PageRangeIndex(
+            (module_id, (config['start_page'], config['end_page'])) for module_id, config in self.modules.items()
+        )
+        blocks = ranges.group(pages, lambda page_num, text: f"=== PÁGINA {page_num} ===\n{text}\n\n")
+        return {module_id: ''.join(parts) for module_id, parts in blocks.items()}
     
     def clean_content(self, text: str) -> str:
         """Limpa e formata o texto"""
@@ -205,18 +180,22 @@ class ContentOrganizer:
     def process_all_modules(self):
         """Processa todos os módulos e gera arquivos JSON"""
         print("🔍 Lendo arquivo fonte...")
-        content = self.read_content()
-        
-        print("📄 Extraindo páginas...")
-        pages = self.extract_pages(content)
-        print(f"✅ {len(pages)} páginas extraídas")
+        print("📄 Indexando páginas...")
+        with self.extract_pages() as pages:
+            print(f"✅ {len(pages)} páginas indexadas")
+            self.process_modules(pages)
         
+        print("\n✨ Processamento concluído!")
+    
+    def process_modules(self, pages: PageIndex):
+        """Gera o JSON de cada módulo a partir das páginas indexadas"""
         print("\n📚 Processando módulos...")
+        contents = self.extract_module_contents(pages)
         for module_id, module_config in self.modules.items():
             print(f"\n  📖 {module_config['name']} (Páginas {module_config['start_page']}-{module_config['end_page']})")
             
             # Extrair conteúdo do módulo
-            module_content = self.extract_module_content(pages, module_config)
+            module_content = contents[module_id]
             
             if not module_content.strip():
                 print(f"    ⚠️  Conteúdo vazio, pulando...")
@@ -233,8 +212,6 @@ class ContentOrganizer:
             print(f"    ✅ Salvo em: {output_file}")
             print(f"    📊 Vocabulário: {len(lesson['vocabulary'])} palavras")
             print(f"    📝 Conteúdo: {len(lesson['content_italian'])} caracteres")
-        
-        print("\n✨ Processamento concluído!")
     
     def generate_summary(self):
         """Gera arquivo de resumo com todos os módulos"""
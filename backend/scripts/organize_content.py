@@ -7,13 +7,56 @@ e cria estrutura JSON organizada por módulos com lições e exercícios.
 
 import re
 import json
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
+
+from page_index import PageIndex, PageRangeIndex
+
+# Linha que inicia um exercício ("E1 -", "Ex1.", "Esercizio 1", "1.", etc.) ou
+# marcador de página do conteúdo montado ("--- Página N ---"). [^\S\n] é espaço
+# sem quebra de linha, para que a busca no texto inteiro nunca atravesse linhas
+EXERCISE_TOKEN_RE = re.compile(
+    r'^(?:--- Página (?P<page>\d+) ---$'
+    r'|[^\S\n]*(?:(?:E|Ex|Esercizio)[^\S\n]*[:\-]?[^\S\n]*(?P<number>\d+)|(?P<item>\d+)\.))',
+    re.MULTILINE
+)
+
+# Exercício segmentado: número, página em que começa, trecho [start, end) no texto e texto
+ExerciseRecord = namedtuple('ExerciseRecord', ['number', 'page', 'start', 'end', 'text'])
+
+def segment_exercises(text: str) -> Iterator[ExerciseRecord]:
+    """
+    Segmenta o texto de exercícios numa única passada, gerando um ExerciseRecord por exercício
+    
+    Uma única busca compilada percorre o texto e para só nas linhas que
+    importam (inícios de exercício e marcadores de página); o texto de cada
+    exercício é recortado de uma vez, do início da linha do cabeçalho até a
+    quebra de linha antes do próximo, sem examinar as demais linhas. Como na
+    versão linha a linha, o texto antes do primeiro exercício é ignorado e um
+    exercício de número 0 não é gerado (as linhas dele são descartadas).
+    """
+    page = None
+    number = None
+    for match in EXERCISE_TOKEN_RE.finditer(text):
+        if match.group('page'):
+            page = int(match.group('page'))
+            continue
+        if number:
+            end = match.start() - 1
+            yield ExerciseRecord(number, start_page, start, end, text[start:end].strip())
+        number = int(match.group('number') or match.group('item'))
+        start, start_page = match.start(), page
+    if number:
+        yield ExerciseRecord(number, start_page, start, len(text), text[start:].strip())
 
 class ContentOrganizer:
-    def __init__(self, input_file: str, output_dir: str):
+    def __init__(self, input_file: str, output_dir: str, jobs: int = 1):
         self.input_file = Path(input_file)
         self.output_dir = Path(output_dir)
+        self.jobs = max(1, jobs)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
         # Definição dos módulos com páginas de conteúdo teórico e exercícios
@@ -116,41 +159,75 @@ class ContentOrganizer:
             }
         ]
     
-    def extract_pages(self, text: str) -> Dict[int, str]:
-        """Extrai páginas individuais do texto"""
-        pages = {}
-        current_page = None
-        current_content = []
-        
-        for line in text.split('\n'):
-            # Detecta marcador de página
-            page_match = re.search(r'PÁGINA\s+(\d+)', line)
-            if page_match:
-                # Salva página anterior
-                if current_page is not None:
-                    pages[current_page] = '\n'.join(current_content).strip()
-                
-                # Inicia nova página
-                current_page = int(page_match.group(1))
-                current_content = []
-            elif current_page is not None and line.strip() and not line.startswith('==='):
-                current_content.append(line)
+    def extract_pages(self, input_file: Path) -> PageIndex:
+        """Indexa as páginas do arquivo (o texto de cada uma é lido sob demanda)"""
+        return PageIndex(input_file)
+    
+    def page_content(self, page_text: str) -> str:
+        """Conteúdo de uma página sem linhas vazias e sem separadores '==='"""
+        lines = [line for line in page_text.split('\n') if line.strip() and not line.startswith('===')]
+        return '\n'.join(lines).strip()
+    
+    def format_page(self, page_num: int, page_text: str) -> str:
+        """Bloco de uma página no conteúdo de um módulo"""
+        return f"--- Página {page_num} ---\n{self.page_content(page_text)}\n"
+    
+    def extract_module_contents(self, pages: PageIndex) -> Dict[str, str]:
+        """
+        Conteúdo teórico de todos os módulos, numa única passada pelas páginas
         
-        # Salva última página
-        if current_page is not None:
-            pages[current_page] = '\n'.join(current_content).strip()
+        Retorna {id do módulo: texto}; cada página é lida e formatada uma vez,
+        mesmo quando aparece em mais de um intervalo.
+        """
+        ranges = PageRangeIndex((module['id'], module['theory_pages']) for module in self.modules)
+        blocks = ranges.group(pages, self.format_page)
+        return {module_id: '\n'.join(parts).strip() for module_id, parts in blocks.items()}
+    
+    def extract_exercise_section(self, pages: PageIndex) -> Tuple[str, Dict[int, Tuple[int, int]]]:
+        """
+        Texto de todas as páginas de exercícios, na ordem, e o trecho [início, fim) de cada página nele
         
-        return pages
+        É o mesmo texto que cada módulo teria, só que contínuo: o conteúdo de
+        exercícios de um módulo é o trecho que vai do início da sua primeira
+        página ao fim da última.
+        """
+        first = min(module['exercise_pages'][0] for module in self.modules)
+        last = max(module['exercise_pages'][1] for module in self.modules)
+        blocks = []
+        spans = {}
+        offset = 0
+        for page_num in sorted(p for p in pages if first <= p <= last):
+            block = self.format_page(page_num, pages[page_num])
+            spans[page_num] = (offset, offset + len(block))
+            blocks.append(block)
+            offset += len(block) + 1
+        return '\n'.join(blocks), spans
     
-    def extract_page_range(self, pages: Dict[int, str], start: int, end: int) -> str:
-        """Extrai conteúdo de um range de páginas"""
-        content = []
-        for page_num in range(start, end + 1):
-            if page_num in pages:
-                content.append(f"--- Página {page_num} ---")
-                content.append(pages[page_num])
-                content.append("")
-        return '\n'.join(content).strip()
+    def assign_exercises(self, section: str, spans: Dict[int, Tuple[int, int]],
+                         records: List[ExerciseRecord]) -> Dict[str, List[Dict]]:
+        """
+        Distribui os exercícios segmentados pelos módulos, pela página em que cada um começa
+        
+        Um exercício que começa numa página de borda vai para os dois módulos;
+        o que continua além da última página de um módulo é cortado ali, como
+        se o módulo tivesse sido segmentado sozinho.
+        """
+        by_page = {}
+        for record in records:
+            by_page.setdefault(record.page, []).append(record)
+        ranges = PageRangeIndex((module['id'], module['exercise_pages']) for module in self.modules)
+        grouped = ranges.group({page_num: by_page[page_num] for page_num in sorted(by_page) if page_num is not None})
+        
+        exercises = {}
+        for module in self.modules:
+            first, last = module['exercise_pages']
+            module_pages = [page_num for page_num in spans if first <= page_num <= last]
+            end = spans[max(module_pages)][1] if module_pages else 0
+            exercises[module['id']] = [
+                {'number': record.number, 'text': section[record.start:min(record.end, end)].strip()}
+                for page_records in grouped[module['id']] for record in page_records
+            ]
+        return exercises
     
     def clean_content(self, text: str) -> str:
         """Limpa conteúdo removendo artefatos de OCR"""
@@ -165,54 +242,15 @@ class ContentOrganizer:
         return '\n'.join(cleaned)
     
     def extract_exercises(self, text: str) -> List[Dict]:
-        """Extrai exercícios do conteúdo"""
-        exercises = []
-        
-        # Padrões para identificar exercícios
-        # Ex: "E1 -", "Ex1.", "Esercizio 1", "1.", etc.
-        exercise_pattern = r'(?:E|Ex|Esercizio)\s*[:\-]?\s*\d+|^\d+\.'
-        
-        lines = text.split('\n')
-        current_exercise = None
-        current_text = []
-        
-        for line in lines:
-            if re.match(exercise_pattern, line.strip()):
-                # Salva exercício anterior
-                if current_exercise:
-                    exercises.append({
-                        'number': current_exercise,
-                        'text': '\n'.join(current_text).strip()
-                    })
-                
-                # Inicia novo exercício
-                match = re.search(r'\d+', line)
-                if match:
-                    current_exercise = int(match.group())
-                    current_text = [line]
-            elif current_exercise:
-                current_text.append(line)
-        
-        # Salva último exercício
-        if current_exercise:
-            exercises.append({
-                'number': current_exercise,
-                'text': '\n'.join(current_text).strip()
-            })
-        
-        return exercises
+        """Extrai exercícios do conteúdo (ver segment_exercises)"""
+        return [{'number': record.number, 'text': record.text} for record in segment_exercises(text)]
     
-    def create_module_structure(self, module: Dict, pages: Dict[int, str]) -> Dict:
-        """Cria estrutura JSON de um módulo"""
-        # Extrai conteúdo teórico
+    def create_module_structure(self, module: Dict, theory_content: str, exercises: List[Dict]) -> Dict:
+        """Cria estrutura JSON de um módulo a partir do conteúdo teórico e dos exercícios segmentados"""
+        # Limpa conteúdo teórico
         theory_start, theory_end = module['theory_pages']
-        theory_content = self.extract_page_range(pages, theory_start, theory_end)
         theory_content = self.clean_content(theory_content)
-        
-        # Extrai exercícios
         exercise_start, exercise_end = module['exercise_pages']
-        exercise_content = self.extract_page_range(pages, exercise_start, exercise_end)
-        exercises = self.extract_exercises(exercise_content)
         
         # Calcula estatísticas
         char_count = len(theory_content)
@@ -247,19 +285,45 @@ class ContentOrganizer:
             'notes': f'Conteúdo extraído de ItalB1-25.pdf via OCR. Teoria: páginas {theory_start}-{theory_end}, Exercícios: páginas {exercise_start}-{exercise_end}'
         }
     
+    def build_module(self, module: Dict, theory_content: str, exercises: List[Dict]) -> Tuple[Dict, Path]:
+        """
+        Cria e grava o JSON de um módulo; retorna (entrada do SUMMARY, arquivo gravado)
+        
+        Com --jobs roda em um processo do pool, por isso recebe o texto e os
+        exercícios já extraídos e devolve só o resumo do módulo.
+        """
+        # Cria estrutura do módulo
+        module_data = self.create_module_structure(module, theory_content, exercises)
+        
+        # Salva arquivo JSON do módulo
+        output_file = self.output_dir / f"{module['id']}.json"
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(module_data, f, ensure_ascii=False, indent=2)
+        
+        entry = {
+            'id': module['id'],
+            'name': module['name'],
+            'level': module['level'],
+            'theory_pages': module_data['theory_pages'],
+            'exercise_pages': module_data['exercise_pages'],
+            'char_count': module_data['statistics']['char_count'],
+            'exercise_count': module_data['exercise_count']
+        }
+        return entry, output_file
+    
     def organize(self):
         """Organiza todo o conteúdo"""
         print(f"📚 Lendo arquivo: {self.input_file}")
         
-        # Lê arquivo completo
-        with open(self.input_file, 'r', encoding='utf-8') as f:
-            full_text = f.read()
-        
-        print("📄 Extraindo páginas individuais...")
-        pages = self.extract_pages(full_text)
-        print(f"✅ {len(pages)} páginas extraídas")
-        
+        print("📄 Indexando páginas individuais...")
+        with self.extract_pages(self.input_file) as pages:
+            print(f"✅ {len(pages)} páginas indexadas")
+            self.organize_modules(pages)
+    
+    def organize_modules(self, pages: PageIndex):
+        """Gera os JSON dos módulos, o SUMMARY.json e as estatísticas a partir das páginas"""
         print("\n🔨 Organizando módulos...")
+        contents = self.extract_module_contents(pages)
         summary = {
             'total_modules': len(self.modules),
             'extraction_date': '2025-11-19',
@@ -269,31 +333,41 @@ class ContentOrganizer:
             'modules': []
         }
         
-        for i, module in enumerate(self.modules, 1):
-            print(f"\n📖 Módulo {i}/{len(self.modules)}: {module['name']}")
-            
-            # Cria estrutura do módulo
-            module_data = self.create_module_structure(module, pages)
-            
-            # Salva arquivo JSON do módulo
-            output_file = self.output_dir / f"{module['id']}.json"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(module_data, f, ensure_ascii=False, indent=2)
-            
-            print(f"   ✅ Teoria: {module_data['statistics']['char_count']} caracteres")
-            print(f"   ✅ Exercícios: {module_data['exercise_count']} identificados")
-            print(f"   💾 Salvo em: {output_file.name}")
-            
-            # Adiciona ao resumo
-            summary['modules'].append({
-                'id': module['id'],
-                'name': module['name'],
-                'level': module['level'],
-                'theory_pages': module_data['theory_pages'],
-                'exercise_pages': module_data['exercise_pages'],
-                'char_count': module_data['statistics']['char_count'],
-                'exercise_count': module_data['exercise_count']
-            })
+        # Exercícios: as páginas 86-174 inteiras são segmentadas numa única passada
+        section, spans = self.extract_exercise_section(pages)
+        started = time.perf_counter()
+        records = list(segment_exercises(section))
+        elapsed = time.perf_counter() - started
+        line_count = section.count('\n') + 1 if section else 0
+        rate = f"{line_count / elapsed:,.0f} linhas/s" if elapsed > 0 else "instantâneo"
+        print(f"🧩 {len(records)} exercícios segmentados em {len(spans)} páginas "
+              f"({line_count:,} linhas, {rate})")
+        module_exercises = self.assign_exercises(section, spans, records)
+        
+        theories = [contents[module['id']] for module in self.modules]
+        exercises = [module_exercises[module['id']] for module in self.modules]
+        
+        # Com --jobs, os módulos são montados e gravados em processos paralelos;
+        # map() devolve os resultados na ordem dos módulos, como na execução serial
+        pool = None
+        if self.jobs > 1:
+            workers = min(self.jobs, len(self.modules))
+            pool = ProcessPoolExecutor(max_workers=workers)
+            print(f"⚙️  Montando módulos em {workers} processos")
+        try:
+            mapper = pool.map if pool is not None else map
+            built = mapper(self.build_module, self.modules, theories, exercises)
+            for i, (module, (entry, output_file)) in enumerate(zip(self.modules, built), 1):
+                print(f"\n📖 Módulo {i}/{len(self.modules)}: {module['name']}")
+                print(f"   ✅ Teoria: {entry['char_count']} caracteres")
+                print(f"   ✅ Exercícios: {entry['exercise_count']} identificados")
+                print(f"   💾 Salvo em: {output_file.name}")
+                
+                # Adiciona ao resumo
+                summary['modules'].append(entry)
+        finally:
+            if pool is not None:
+                pool.shutdown()
         
         # Salva resumo
         summary_file = self.output_dir / 'SUMMARY.json'
@@ -328,16 +402,22 @@ class ContentOrganizer:
                 print(f"   • {level}: {stats['count']} módulos, {stats['exercises']} exercícios")
 
 if __name__ == '__main__':
-    import sys
-    
-    if len(sys.argv) < 3:
-        print("Uso: python3 organize_content.py <arquivo_entrada.txt> <pasta_saida>")
-        print("\nExemplo:")
-        print("  python3 organize_content.py ItalB1-25.txt modules_organized")
-        sys.exit(1)
+    import argparse
     
-    input_file = sys.argv[1]
-    output_dir = sys.argv[2]
+    parser = argparse.ArgumentParser(
+        description='Organiza o conteúdo extraído do PDF em módulos JSON',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=(
+            "Exemplo:\n"
+            "  python3 organize_content.py ItalB1-25.txt modules_organized\n"
+            "  python3 organize_content.py ItalB1-25.txt modules_organized --jobs 4"
+        )
+    )
+    parser.add_argument('input_file', help='arquivo .txt extraído pelo OCR')
+    parser.add_argument('output_dir', help='pasta de saída dos JSON dos módulos')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='módulos montados e gravados em paralelo, em processos (padrão: 1)')
+    args = parser.parse_args()
     
-    organizer = ContentOrganizer(input_file, output_dir)
+    organizer = ContentOrganizer(args.input_file, args.output_dir, args.jobs)
     organizer.organize()
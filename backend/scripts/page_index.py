@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Índice de páginas e linhas do texto extraído pelo OCR (ItalB1-25.txt)
+Mapeia o arquivo em memória e guarda só posições em bytes (de cada página e
+do início de cada linha); o texto é recortado do arquivo apenas quando é pedido.
+As posições ficam num arquivo binário ao lado do texto (<arquivo>.pageidx),
+reaproveitado pelas execuções seguintes enquanto o texto não mudar.
+"""
+
+import os
+import re
+import sys
+import mmap
+import struct
+import hashlib
+from array import array
+from collections.abc import Mapping
+from pathlib import Path
+
+# Linha de cabeçalho de página gerada pelo extract_pdf_ocr.py ("PÁGINA N"); como na
+# leitura em modo texto, '\r\n', '\r' e '\n' terminam uma linha
+PAGE_LINE_RE = re.compile(r'(?<![^\r\n])[ \t]*PÁGINA[ \t]+(\d+)[ \t]*(?![^\r\n])'.encode('utf-8'))
+LINE_BREAK_RE = re.compile(rb'\r\n|\r|\n')
+
+# Arquivo de índice: cabeçalho (assinatura, versão, tamanho, mtime em ns e
+# SHA-256 do texto, nº de páginas, nº de linhas), depois (página, início, fim)
+# de cada página e o início de cada linha, todos em uint64 little-endian
+SIDECAR_SUFFIX = '.pageidx'
+SIDECAR_MAGIC = b'PGIX'
+SIDECAR_VERSION = 2
+SIDECAR_HEADER = struct.Struct('<4sHQQ32sII')
+
+def sidecar_path(path):
+    """Caminho do índice persistido de um arquivo de texto"""
+    path = Path(path)
+    return path.with_name(path.name + SIDECAR_SUFFIX)
+
+def _decode(data):
+    """Decodifica um trecho do texto com as quebras de linha normalizadas para '\\n'"""
+    return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+def _uint64_array(data=b''):
+    values = array('Q')
+    values.frombytes(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+def _uint64_bytes(values):
+    if sys.byteorder != 'little':
+        values = array('Q', values)
+        values.byteswap()
+    return values.tobytes()
+
+class PageIndex(Mapping):
+    """Dicionário somente leitura {página: texto} de um texto com cabeçalhos 'PÁGINA N'"""
+    
+    def __init__(self, path, sidecar=True):
+        self.path = Path(path)
+        self.sidecar_path = sidecar_path(self.path)
+        self.offsets = {}
+        self.line_starts = array('Q')
+        self.rebuilt = False
+        self._file = open(self.path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        if stat.st_size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._map = b''
+        
+        if not (sidecar and self._load(stat)):
+            self._scan()
+            self.rebuilt = True
+            if sidecar:
+                self._save(stat)
+    
+    def _digest(self):
+        return hashlib.sha256(self._map).digest()
+    
+    def _scan(self):
+        """Registra o intervalo de bytes de cada página e o início de cada linha"""
+        size = len(self._map)
+        banners = list(PAGE_LINE_RE.finditer(self._map))
+        # O conteúdo termina na quebra de linha que precede o próximo cabeçalho
+        ends = [banner.start() - (2 if self._map[banner.start() - 2:banner.start()] == b'\r\n' else 1)
+                for banner in banners[1:]] + [size]
+        for banner, end in zip(banners, ends):
+            line_break = LINE_BREAK_RE.match(self._map, banner.end())
+            start = line_break.end() if line_break else size
+            self.offsets[int(banner.group(1))] = (start, max(start, end))
+        
+        # Uma linha começa no início do arquivo e depois de cada quebra (exceto no fim)
+        if size:
+            self.line_starts.append(0)
+            self.line_starts.extend(m.end() for m in LINE_BREAK_RE.finditer(self._map) if m.end() < size)
+    
+    def _load(self, stat):
+        """Lê o índice persistido; retorna False se ele não existir ou não valer para o texto"""
+        try:
+            data = self.sidecar_path.read_bytes()
+            magic, version, size, mtime_ns, digest, page_count, line_count = \
+                SIDECAR_HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return False
+        if magic != SIDECAR_MAGIC or version != SIDECAR_VERSION or size != stat.st_size:
+            return False
+        
+        pages_size = page_count * 3 * 8
+        if len(data) != SIDECAR_HEADER.size + pages_size + line_count * 8:
+            return False
+        if mtime_ns != stat.st_mtime_ns and digest != self._digest():
+            return False
+        
+        pages = _uint64_array(data[SIDECAR_HEADER.size:SIDECAR_HEADER.size + pages_size])
+        self.offsets = {pages[i]: (pages[i + 1], pages[i + 2]) for i in range(0, len(pages), 3)}
+        self.line_starts = _uint64_array(data[SIDECAR_HEADER.size + pages_size:])
+        if mtime_ns != stat.st_mtime_ns:
+            # Mesmo conteúdo com outro mtime: o índice vale, só o cabeçalho é atualizado
+            self._save(stat, digest, data[SIDECAR_HEADER.size:])
+        return True
+    
+    def _save(self, stat, digest=None, body=None):
+        """Grava o índice ao lado do texto (troca atômica; ignorado se não houver permissão)"""
+        if body is None:
+            pages = array('Q')
+            for page_num, (start, end) in self.offsets.items():
+                pages.extend((page_num, start, end))
+            body = _uint64_bytes(pages) + _uint64_bytes(self.line_starts)
+        header = SIDECAR_HEADER.pack(SIDECAR_MAGIC, SIDECAR_VERSION, stat.st_size, stat.st_mtime_ns,
+                                     digest or self._digest(), len(self.offsets), len(self.line_starts))
+        tmp_path = self.sidecar_path.with_name(f"{self.sidecar_path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(header)
+                f.write(body)
+            os.replace(tmp_path, self.sidecar_path)
+        except OSError:
+            # Diretório somente leitura: o índice continua valendo nesta execução
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+    
+    def span(self, page_num):
+        """Intervalo (início, fim) em bytes do conteúdo de uma página"""
+        return self.offsets[page_num]
+    
+    @property
+    def line_count(self):
+        """Número de linhas do texto (como len(readlines()))"""
+        return len(self.line_starts)
+    
+    def line_offset(self, line_num):
+        """Posição em bytes do início de uma linha (numeradas a partir de 1)"""
+        return self.line_starts[line_num - 1]
+    
+    def lines(self, start_line, end_line=None):
+        """
+        Texto das linhas start_line até end_line - 1 (numeradas a partir de 1)
+        
+        Equivale a ''.join(readlines()[start_line - 1:end_line - 1]), inclusive
+        ao passar do fim do arquivo, mas lê só o trecho pedido.
+        """
+        first = max(start_line - 1, 0)
+        last = self.line_count if end_line is None else min(max(end_line - 1, 0), self.line_count)
+        if first >= last:
+            return ''
+        start = self.line_starts[first]
+        end = self.line_starts[last] if last < self.line_count else len(self._map)
+        return _decode(self._map[start:end])
+    
+    def __getitem__(self, page_num):
+        start, end = self.offsets[page_num]
+        return _decode(self._map[start:end])
+    
+    def __contains__(self, page_num):
+        return page_num in self.offsets
+    
+    def __iter__(self):
+        return iter(self.offsets)
+    
+    def __len__(self):
+        return len(self.offsets)
+    
+    def close(self):
+        """Libera o mapeamento e o arquivo"""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+class PageRangeIndex:
+    """
+    Índice de intervalos de páginas (inclusivos), como os de teoria e exercícios dos módulos
+    
+    Os intervalos podem se sobrepor nas bordas (3-4 e 4-8 dividem a página 4).
+    Em vez de cada intervalo percorrer as suas páginas, as páginas são
+    percorridas uma única vez em ordem crescente, mantendo só os intervalos
+    abertos naquele ponto, e cada página é entregue a todos eles: o custo
+    cresce com o tamanho do livro, não com intervalos × páginas.
+    """
+    
+    def __init__(self, ranges):
+        """`ranges`: pares (chave, (primeira, última)); as chaves identificam os intervalos"""
+        self.ranges = sorted(((first, last, key) for key, (first, last) in ranges), key=lambda r: r[0])
+    
+    def assign(self, page_numbers):
+        """Gera (página, [chaves]) para cada página que pertence a algum intervalo"""
+        following = 0
+        active = []
+        for page_num in sorted(page_numbers):
+            while following < len(self.ranges) and self.ranges[following][0] <= page_num:
+                active.append(self.ranges[following])
+                following += 1
+            active = [r for r in active if r[1] >= page_num]
+            if active:
+                yield page_num, [key for _, _, key in active]
+    
+    def group(self, pages, render=None):
+        """
+        {chave: [trecho de cada página do intervalo, em ordem]} numa única passada por `pages`
+        
+        `pages` é um {página: texto} (como o PageIndex). `render(página, texto)`
+        monta o trecho de cada página uma só vez, mesmo que ela pertença a
+        vários intervalos; por padrão, o trecho é o próprio texto.
+        """
+        groups = {key: [] for _, _, key in self.ranges}
+        for page_num, keys in self.assign(pages):
+            text = pages[page_num]
+            piece = render(page_num, text) if render else text
+            for key in keys:
+                groups[key].append(piece)
+        return groups
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Uso: python3 page_index.py <arquivo.txt> [página]")
+        print("\nExemplo:")
+        print("  python3 page_index.py ItalB1-25.txt 86")
+        sys.exit(1)
+    
+    with PageIndex(sys.argv[1]) as index:
+        if len(sys.argv) > 2:
+            page_num = int(sys.argv[2])
+            if page_num not in index:
+                print(f"❌ Página {page_num} não encontrada")
+                sys.exit(1)
+            print(index[page_num])
+        else:
+            pages = list(index)
+            origin = 'reconstruído' if index.rebuilt else 'reaproveitado'
+            print(f"📄 {len(pages)} páginas e {index.line_count} linhas indexadas em {index.path}")
+            print(f"🗂️  Índice {origin}: {index.sidecar_path}")
+            if pages:
+                print(f"   • Primeira: {pages[0]}, última: {pages[-1]}")